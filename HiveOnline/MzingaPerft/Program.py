@@ -0,0 +1,38 @@
+import sys
+
+from MzingaShared.Core import Perft
+
+
+class Program:
+    @staticmethod
+    def main(args):
+        if args is None or len(args) < 1:
+            print("Usage: Program.py depth [Original|Extended] [divide]")
+            return
+
+        depth = int(args[0])
+        game_types = [a for a in args[1:] if a in Perft.reference_positions] or None
+        divide = "divide" in args[1:]
+
+        total_nodes = 0
+        total_elapsed = 0.0
+        mismatches = 0
+        for game_type, board_string, result in Perft.run_reference_perft(depth, game_types, divide):
+            print("%s %s" % (game_type, board_string))
+            if result.divide is not None:
+                for move, nodes in result.divide:
+                    print("  %s %d" % (move, nodes))
+            print("  %s" % result)
+            total_nodes += result.nodes
+            total_elapsed += result.elapsed
+            mismatches += result.passed is False
+
+        print("total nodes %d time %.3fs nps %.0f" %
+              (total_nodes, total_elapsed, total_nodes / total_elapsed if total_elapsed > 0 else 0.0))
+        if mismatches:
+            print("%d reference count(s) didn't match" % mismatches)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    Program().main(sys.argv[1:])
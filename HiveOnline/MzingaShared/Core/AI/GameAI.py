@@ -4,26 +4,50 @@ try:
     import numpy as np
     eps = np.finfo(float).eps
 except ModuleNotFoundError:
+    np = None
     eps = sys.float_info.min
 
-import functools
+import asyncio
 import datetime
+import multiprocessing
+from operator import mul
 
 from MzingaShared.Core import EnumUtils
-from MzingaShared.Core.EnumUtils import EnumUtils as EnumUtilsCls
-from MzingaShared.Core.FixedCache import FixedCache
-from MzingaShared.Core.Move import Move
+from MzingaShared.Core.CacheMetrics import CacheMetrics
+from MzingaShared.Core.EnumUtils import EnumUtils as EnumUtilsCls, num_piece_names, \
+                                        piece_bug_types, piece_colours
+from MzingaShared.Core.FixedCache import FixedCache, get_entry_size_in_bytes
+from MzingaShared.Core.GameBoard import GameBoard
+from MzingaShared.Core.Move import Move, from_move_key, pass_turn
+from MzingaShared.Core.Position import num_cells
+from MzingaShared.Core.ZobristHash import mix_64, mask_64
 from MzingaShared.Core.MoveSet import MoveSet
 from MzingaShared.Core.AI.BoardMetricWeights import BoardMetricWeights
 from MzingaShared.Core.AI.EvaluatedMove import EvaluatedMove
 from MzingaShared.Core.AI.EvaluatedMoveCollection import EvaluatedMoveCollection
+from MzingaShared.Core.AI.GameAIConfig import GameAIConfig
 from MzingaShared.Core.AI.ListExtensions import ListExtensions
-from MzingaShared.Core.AI.MetricWeights import MetricWeights
-from MzingaShared.Core.AI.TranspositionTable import TranspositionTable, \
+from MzingaShared.Core.AI.MetricWeights import MetricWeights, num_bug_type_weights, extended_num_bug_type_weights
+from MzingaShared.Core.AI.SharedTranspositionTable import SharedTranspositionTable, shared_memory
+from MzingaShared.Core.AI.TranspositionTable import TranspositionTable, default_size_in_bytes, \
                                                     TranspositionTableEntry, TranspositionTableEntryType
 from Utils.Events import Broadcaster
 
 debug = False
+max_cached_noisy_moves = 65536
+max_killer_plies = 64
+max_history_score = 1 << 24
+aspiration_window_growth = 4
+max_aspiration_researches = 3
+null_move_reduction = 2
+null_move_min_depth = 3
+null_move_max_queen_neighbours = 3
+late_move_reduction = 1
+late_move_min_depth = 2
+late_move_min_index = 3
+max_quiescence_batch_size = 16
+helper_order_types = ("Skip", "SkipOffset", "Default")
+board_score_entry_size_in_bytes = get_entry_size_in_bytes(1 << 63, 0.5)
 debug_log_path = "/Users/tylergillson/Dropbox/UofC/F2018/CPSC.502.06/MzingaPorted/HiveOnline/MzingaTrainer/Profiles/ExtendedProfiles/"
 
 
@@ -65,14 +89,21 @@ class GameAI:
     start_metric_weights = None
     end_metric_weights = None
     max_max_branching_factor = 500
-    default_board_scores_cache_size = 516240
+    default_aspiration_window = 500
+    default_board_scores_cache_size_in_bytes = 64 * 1024 * 1024
     quiescent_search_max_depth = 3  # To prevent runaway stack overflows
     max_depth = 10
     game_type = None
 
     _max_branching_factor = max_max_branching_factor  # To prevent search explosion
+    _aspiration_window = default_aspiration_window
+    use_null_move_pruning = True
+    use_late_move_reductions = True
     _transposition_table = None
-    _cached_board_scores = FixedCache(default_board_scores_cache_size)
+    _transposition_table_size_mb = None
+    use_shared_board_scores = True
+    # Shared by every GameAI in the process, which is safe because scores are keyed by their weights' fingerprint:
+    _cached_board_scores = FixedCache(default_board_scores_cache_size_in_bytes // board_score_entry_size_in_bytes)
 
     @property
     def transposition_table_hits(self):
@@ -80,7 +111,11 @@ class GameAI:
 
     @property
     def cached_board_score_hits(self):
-        return self._cached_board_scores.metrics.hits
+        return self.board_score_metrics.hits
+
+    @property
+    def cached_board_score_misses(self):
+        return self.board_score_metrics.misses
 
     def set_mixed_battle_use_extended(self, game_board):
         if game_board.mixed_battle:
@@ -89,6 +124,15 @@ class GameAI:
     def __init__(self, battle_key, config=None):
         self.battle_key = battle_key
         self.mixed_battle_use_extended = True
+        self._compiled_metric_weights = {}
+        self._weights_fingerprints = {}
+        self._cached_noisy_moves = {}
+        self.board_score_metrics = CacheMetrics()  # This AI's lookups, whether or not the cache is shared
+
+        # Move ordering hints, indexed by ply, and by (piece id, destination cell id):
+        self._killer_moves = [[None, None] for _ in range(max_killer_plies)]
+        self._history_scores = [0] * (num_piece_names * num_cells)
+        self._counter_moves = [None] * (num_piece_names * num_cells)
 
         # Opening move heuristic constants:
         self.board_turn_cap = 9
@@ -105,17 +149,38 @@ class GameAI:
             self.end_metric_weights = config.end_metric_weights.clone() \
                 if config.end_metric_weights else MetricWeights(self.game_type)
 
+            size_in_bytes = default_size_in_bytes
             if config.transposition_table_size_mb is not None:
                 if config.transposition_table_size_mb <= 0:
                     raise ValueError("Invalid config.transposition_table_size_mb.")
-                self._transposition_table = TranspositionTable(config.transposition_table_size_mb * 1024 * 1024)
+                size_in_bytes = config.transposition_table_size_mb * 1024 * 1024
+                self._transposition_table_size_mb = config.transposition_table_size_mb
+
+            # A shared table lets helper processes see each other's entries:
+            if config.use_shared_transposition_table and shared_memory is not None:
+                self._transposition_table = SharedTranspositionTable(size_in_bytes)
             else:
-                self._transposition_table = TranspositionTable()
+                self._transposition_table = TranspositionTable(size_in_bytes)
 
             if config.max_branching_factor is not None:
                 if config.max_branching_factor <= 0:
                     raise ValueError("Invalid config.max_branching_factor.")
                 self._max_branching_factor = config.max_branching_factor
+
+            if config.aspiration_window is not None:
+                if config.aspiration_window < 0:
+                    raise ValueError("Invalid config.aspiration_window.")
+                self._aspiration_window = config.aspiration_window
+
+            if config.use_shared_board_scores is not None and not config.use_shared_board_scores:
+                self.use_shared_board_scores = False
+                self._cached_board_scores = FixedCache(
+                    self.default_board_scores_cache_size_in_bytes // board_score_entry_size_in_bytes)
+
+            if config.use_null_move_pruning is not None:
+                self.use_null_move_pruning = config.use_null_move_pruning
+            if config.use_late_move_reductions is not None:
+                self.use_late_move_reductions = config.use_late_move_reductions
         else:
             self.game_type = "Original"
             self.use_heuristics = False
@@ -126,7 +191,16 @@ class GameAI:
 
     def reset_caches(self):
         self._transposition_table.clear()
-        self._cached_board_scores.clear()
+        if not self.use_shared_board_scores:
+            self._cached_board_scores.clear()
+        self.board_score_metrics.reset()
+        self._cached_noisy_moves.clear()
+        self.reset_move_ordering()
+
+    def reset_move_ordering(self):
+        self._killer_moves = [[None, None] for _ in range(max_killer_plies)]
+        self._history_scores = [0] * (num_piece_names * num_cells)
+        self._counter_moves = [None] * (num_piece_names * num_cells)
 
     def log(self, value):
         log_path = "".join([debug_log_path, self.battle_key, "_move_log.txt"])
@@ -151,19 +225,92 @@ class GameAI:
         if game_board.game_is_over:
             raise Exception("Game is over.")
 
-        best_move_params = BestMoveParams(max_depth, None, None)
-        evaluated_moves = await self.evaluate_moves_async(game_board, best_move_params, **kwargs)
+        max_helper_threads = int(kwargs.pop('max_helper_threads', None) or 0)
+        best_move_params = BestMoveParams(max_depth, max_helper_threads, None)
+
+        helpers = self.start_helper_searches(game_board, best_move_params, kwargs.get('max_time'))
+        try:
+            evaluated_moves = await self.evaluate_moves_async(game_board, best_move_params, **kwargs)
+        finally:
+            helper_move = self.stop_helper_searches(game_board, helpers)
 
         if evaluated_moves.count == 0:
             raise Exception("No moves after evaluation!")
 
+        # Prefer a helper's result when it completed a deeper iteration:
+        best_move = evaluated_moves.best_move
+        if helper_move is not None and helper_move.depth > best_move.depth and \
+                best_move.score_after_move != float("inf"):
+            best_move = helper_move
+
         # Make sure at least one move is reported
-        self.best_move_found.on_change.fire(self, best_move_params, evaluated_moves.best_move, handler_key=0)
+        self.best_move_found.on_change.fire(self, best_move_params, best_move, handler_key=0)
         if debug:
             self.log("".join(["Returning Best Move: ", str(best_move_params.best_move.move)]))
 
         return best_move_params.best_move.move
 
+    # region Helper Searches
+    def start_helper_searches(self, game_board, best_move_params, max_time):
+        # Lazy SMP: helper processes (threads would share the GIL) search the same root with diversified move orders
+        # and depths, reporting each completed iteration back through a pipe.
+        if best_move_params.max_helper_threads <= 0 or best_move_params.max_search_depth <= 1 or \
+                multiprocessing.current_process().daemon:
+            return []
+
+        helpers = []
+        board_args = (game_board.board_string, game_board.game_type, game_board.mixed_battle,
+                      game_board.extended_colour, game_board.last_piece_moved_id)
+        ai_args = self.get_helper_ai_args()
+
+        for i in range(best_move_params.max_helper_threads):
+            order_type = helper_order_types[i % len(helper_order_types)]
+            max_depth = best_move_params.max_search_depth + i % 2
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=run_helper_search, args=(ai_args, board_args, max_depth, order_type, max_time, sender),
+                daemon=True)
+            process.start()
+            sender.close()
+            helpers.append((process, receiver))
+        return helpers
+
+    def get_helper_ai_args(self):
+        # Only picklable inputs, since spawned helpers can't be sent this GameAI (its caches hold locks).
+        # A shared transposition table pickles as its buffer's name, otherwise each helper uses its own table:
+        config = GameAIConfig(self.start_metric_weights, self.end_metric_weights, self._transposition_table_size_mb,
+                              self.game_type, b_factor=self._max_branching_factor,
+                              board_weights=self.board_metric_weights, use_heuristics=self.use_heuristics,
+                              aspiration_window=self._aspiration_window,
+                              null_move_pruning=self.use_null_move_pruning,
+                              late_move_reductions=self.use_late_move_reductions,
+                              shared_board_scores=self.use_shared_board_scores)
+        shared_table = self._transposition_table \
+            if isinstance(self._transposition_table, SharedTranspositionTable) else None
+        return self.battle_key, config, shared_table
+
+    @staticmethod
+    def stop_helper_searches(game_board, helpers):
+        # Returns the deepest result reported by any helper:
+        best_move = None
+        for process, receiver in helpers:
+            try:
+                while receiver.poll():
+                    move_key, score, depth = receiver.recv()
+                    if best_move is None or (depth, score) > (best_move.depth, best_move.score_after_move):
+                        best_move = EvaluatedMove(from_move_key(move_key), score, depth)
+            except (EOFError, OSError):
+                pass
+
+            process.terminate()
+            process.join()
+            receiver.close()
+
+        if best_move is not None and not game_board.get_valid_moves().contains(best_move.move):
+            return None
+        return best_move
+    # endregion
+
     async def evaluate_moves_async(self, game_board, best_move_params, **kwargs):
         timeout = kwargs.get('max_time') if 'max_time' in kwargs else None
         start_time = kwargs.get('start_time') if 'start_time' in kwargs else None
@@ -171,11 +318,14 @@ class GameAI:
         moves_to_evaluate = EvaluatedMoveCollection()
         best_move = None
 
+        # Killer moves are only meaningful within one search:
+        self._killer_moves = [[None, None] for _ in range(max_killer_plies)]
+
         # Try to get cached best move if available
         key = game_board.zobrist_key
         flag, t_entry = self._transposition_table.try_lookup(key)
         if flag and t_entry.best_move is not None:
-            best_move = EvaluatedMove(t_entry.best_move, t_entry.value, t_entry.depth)
+            best_move = EvaluatedMove(from_move_key(t_entry.best_move), t_entry.value, t_entry.depth)
             self.best_move_found.on_change.fire(self, best_move_params, best_move, handler_key=0)
 
         if best_move is not None and best_move.score_after_move == float("inf"):
@@ -192,12 +342,14 @@ class GameAI:
         if self.use_heuristics:
             board_turn = game_board.current_turn
 
-            def get_piece_name(move):
-                return move.piece_name if isinstance(move, Move) else move.move.piece_name
+            def get_piece_id(move):
+                return move.piece_id if isinstance(move, Move) else move.move.piece_id
+
+            soldier_ant = EnumUtils.bug_types["SoldierAnt"]
 
             # Prevent Extended AI from opening with a SoldierAnt:
             if board_turn <= 2:
-                valid_moves = [m for m in valid_moves if "SoldierAnt" not in get_piece_name(m)]
+                valid_moves = [m for m in valid_moves if piece_bug_types[get_piece_id(m)] != soldier_ant]
 
             # Opening move heuristics for turns 2-5:
             if 2 < board_turn <= self.board_turn_cap:
@@ -213,10 +365,12 @@ class GameAI:
                         self.board_turn_cap += 2
                         self.deploy_soldier_ants_turn += 2
                     else:
-                        valid_moves = [m for m in valid_moves if "SoldierAnt" in get_piece_name(m)]
+                        valid_moves = [m for m in valid_moves if piece_bug_types[get_piece_id(m)] == soldier_ant]
 
                         if num_soldier_ants == 1:
-                            valid_moves = [m for m in valid_moves if "SoldierAnt2" in get_piece_name(m)]
+                            second_ants = (EnumUtils.piece_names["WhiteSoldierAnt2"],
+                                           EnumUtils.piece_names["BlackSoldierAnt2"])
+                            valid_moves = [m for m in valid_moves if get_piece_id(m) in second_ants]
         #####################
 
         # If necessary, convert each entry of valid_moves to an EvaluatedMove:
@@ -248,6 +402,8 @@ class GameAI:
             args = [game_board.current_turn_colour, bench_pieces,
                     num_white_pieces, num_black_pieces, self.start_metric_weights]
             modulate_in_play_weights(*args)
+            self._compiled_metric_weights.clear()
+            self._weights_fingerprints.clear()
         #########################
 
         # Iterative search
@@ -257,8 +413,12 @@ class GameAI:
                 if datetime.datetime.now() > start_time + timeout:
                     break
 
+            # Age history scores so the latest iteration dominates:
+            self._history_scores = [score >> 1 for score in self._history_scores]
+
             # "Re-sort" moves to evaluate based on the next iteration
-            moves_to_evaluate = await self.evaluate_moves_to_depth_async(game_board, depth, moves_to_evaluate, **kwargs)
+            moves_to_evaluate = await self.evaluate_moves_with_aspiration_async(
+                game_board, depth, moves_to_evaluate, **kwargs)
             if debug:
                 self.log("Re-sorted:")
                 self.log(str(moves_to_evaluate))
@@ -279,22 +439,70 @@ class GameAI:
 
         return moves_to_evaluate
 
-    async def evaluate_moves_to_depth_async(self, game_board, depth, moves_to_evaluate, **kwargs):
-        alpha = float("-inf")
-        beta = float("inf")
+    async def evaluate_moves_with_aspiration_async(self, game_board, depth, moves_to_evaluate, **kwargs):
+        timeout = kwargs.get('max_time') if 'max_time' in kwargs else None
+        start_time = kwargs.get('start_time') if 'start_time' in kwargs else None
+
+        inf = float("inf")
+        width = self._aspiration_window
+        previous_best = moves_to_evaluate.best_move
+
+        # Only centre a window on a finite score from a completed iteration:
+        if width <= 0 or previous_best.depth == 0 or abs(previous_best.score_after_move) == inf:
+            return await self.evaluate_moves_to_depth_async(game_board, depth, moves_to_evaluate, **kwargs)
+
+        guess = previous_best.score_after_move
+        alpha = guess - width
+        beta = guess + width
+        researches = 0
+
+        while True:
+            evaluated_moves = await self.evaluate_moves_to_depth_async(
+                game_board, depth, moves_to_evaluate, alpha, beta, **kwargs)
+
+            best_move = evaluated_moves.best_move
+            if best_move is None or best_move.depth == 0:
+                return evaluated_moves  # Cancelled
+
+            # A forced win or loss can't fall inside any window, including a bound that is already infinite:
+            best_value = best_move.score_after_move
+            if alpha < best_value < beta or abs(best_value) == inf:
+                return evaluated_moves
+
+            if timeout and datetime.datetime.now() > start_time + timeout:
+                # A failed window's results are bounds, and a fail-high's are truncated, so keep the previous
+                # iteration's ordering, only promoting a fail-high move, which is at least as good as beta:
+                if best_value <= alpha:
+                    return moves_to_evaluate
+                promoted_moves = EvaluatedMoveCollection()
+                promoted_moves.add(evaluated_moves=[best_move] + [
+                    em for em in moves_to_evaluate.get_enumerator() if em.move != best_move.move], re_sort=False)
+                return promoted_moves
+
+            # Fail-low or fail-high, widen the failing side and re-search:
+            researches += 1
+            width *= aspiration_window_growth
+            if best_value <= alpha:
+                alpha = -inf if researches >= max_aspiration_researches else guess - width
+            else:
+                beta = inf if researches >= max_aspiration_researches else guess + width
+
+    async def evaluate_moves_to_depth_async(self, game_board, depth, moves_to_evaluate,
+                                            alpha=float("-inf"), beta=float("inf"), **kwargs):
         colour = 1 if game_board.current_turn_colour == "White" else -1
         alpha_original = alpha
         best_value = None
         first_move = True
         evaluated_moves = EvaluatedMoveCollection()
+        order_type = kwargs.pop('order_type', "Default")
 
         timeout = kwargs.get('max_time') if 'max_time' in kwargs else None
         start_time = kwargs.get('start_time') if 'start_time' in kwargs else None
 
         # Optimize loop:
         global eps
-        trusted_play = game_board.trusted_play
-        undo_last_move = game_board.undo_last_move
+        make_move = game_board.make_move
+        unmake_move = game_board.unmake_move
         principal_variation_search_async = self.principal_variation_search_async
         now = datetime.datetime.now
         eval_moves_add = evaluated_moves.add
@@ -304,27 +512,27 @@ class GameAI:
                 self.log("".join(["Evaluating: ", str(move_to_evaluate)]))
 
             update_alpha = False
-            trusted_play(move_to_evaluate.move)
+            make_move(move_to_evaluate.move)
 
             if first_move:
                 # Full window search
                 value = -1 * await principal_variation_search_async(
-                    game_board, depth - 1, -beta, -alpha, -colour, "Default", **kwargs)
+                    game_board, depth - 1, -beta, -alpha, -colour, order_type, **kwargs)
                 update_alpha = True
                 first_move = False
             else:
                 # Null window search
                 value = -1 * await principal_variation_search_async(
-                    game_board, depth - 1, -alpha - eps, -alpha, -colour, "Default", **kwargs)
+                    game_board, depth - 1, -alpha - eps, -alpha, -colour, order_type, **kwargs)
 
                 if value is not None and alpha < value < beta:
                     # Re-search with full window
                     value = -1 * await principal_variation_search_async(
-                        game_board, depth - 1, -beta, -alpha, -colour, "Default", **kwargs)
+                        game_board, depth - 1, -beta, -alpha, -colour, order_type, **kwargs)
 
                     update_alpha = True
 
-            undo_last_move()
+            unmake_move()
 
             # Cancel occurred during evaluation
             if value is None:
@@ -340,7 +548,7 @@ class GameAI:
                 best_value = value
 
             if best_value >= beta:
-                break  # A winning move has been found, since beta is always infinity in this function
+                break  # A winning move, or a fail-high outside the aspiration window
 
             if timeout:
                 if now() > start_time + timeout:
@@ -350,14 +558,13 @@ class GameAI:
         t_entry = TranspositionTableEntry()
 
         if best_value <= alpha_original:
-            # Losing move since alpha_original is negative infinity in this function
+            # Losing move, or a fail-low below the aspiration window
             t_entry.type = TranspositionTableEntryType.upper_bound
         else:
-            # Move is a lower bound winning move if best_value >= beta
-            # (always infinity in this function), otherwise it's exact
+            # Move is a lower bound winning move if best_value >= beta, otherwise it's exact
             t_entry.type = TranspositionTableEntryType.lower_bound \
                 if best_value >= beta else TranspositionTableEntryType.exact
-            t_entry.best_move = evaluated_moves.best_move.move
+            t_entry.best_move = evaluated_moves.best_move.move.key
 
         t_entry.value = best_value
         t_entry.depth = depth
@@ -388,6 +595,24 @@ class GameAI:
         if depth == 0 or game_board.game_is_over:
             return await self.quiescence_search_async(game_board, self.quiescent_search_max_depth, alpha, beta, colour)
 
+        global eps
+        principal_variation_search_async = self.principal_variation_search_async
+
+        # Null move pruning, only in null window nodes:
+        if depth >= null_move_min_depth and beta - alpha <= eps and kwargs.get('null_move', True) and \
+                self.is_null_move_allowed(game_board):
+            game_board.make_move(pass_turn())
+            value = await principal_variation_search_async(
+                game_board, depth - 1 - null_move_reduction, -beta, -beta + eps, -colour, order_type)
+            game_board.unmake_move()
+
+            if value is not None and -value >= beta:
+                # Verify with a reduced search of this node that can't null move again:
+                value = await principal_variation_search_async(
+                    game_board, depth - null_move_reduction, alpha, beta, colour, order_type, null_move=False)
+                if value is not None and value >= beta:
+                    return beta
+
         best_value = None
         best_move = t_entry.best_move if t_entry else None
         first_move = True
@@ -397,16 +622,19 @@ class GameAI:
             self.log(str(moves))
 
         # Optimize loop:
-        global eps
         en_moves = ListExtensions.get_enumerable_by_order_type(moves, order_type) if order_type != "Default" else moves
-        trusted_play = game_board.trusted_play
-        undo_last_move = game_board.undo_last_move
-        principal_variation_search_async = self.principal_variation_search_async
+        make_move = game_board.make_move
+        unmake_move = game_board.unmake_move
+        is_noisy_move = self.is_noisy_move
         now = datetime.datetime.now
+        reduce_late_moves = self.use_late_move_reductions and depth >= late_move_min_depth
 
-        for move in en_moves:
+        for move_index, move in enumerate(en_moves):
             update_alpha = False
-            trusted_play(move)
+            # Late quiet moves are searched shallower first:
+            reduced = reduce_late_moves and move_index >= late_move_min_index and \
+                not move.is_pass and not is_noisy_move(game_board, move)
+            make_move(move)
 
             if first_move:
                 # Full window search
@@ -415,17 +643,26 @@ class GameAI:
                 update_alpha = True
                 first_move = False
             else:
-                # Null window search
-                value = -1 * await principal_variation_search_async(
-                    game_board, depth - 1, -alpha - eps, -alpha, -colour, order_type)
+                if reduced:
+                    # Reduced null window search
+                    value = -1 * await principal_variation_search_async(
+                        game_board, depth - 1 - late_move_reduction, -alpha - eps, -alpha, -colour, order_type)
 
-                if value is not None and alpha < value < beta:
-                    # Re-search with full window
+                    # Verify at full depth if the move beats alpha:
+                    reduced = value is not None and value <= alpha
+
+                if not reduced:
+                    # Null window search
                     value = -1 * await principal_variation_search_async(
-                        game_board, depth - 1, -beta, -alpha, -colour, order_type)
-                    update_alpha = True
+                        game_board, depth - 1, -alpha - eps, -alpha, -colour, order_type)
+
+                    if value is not None and alpha < value < beta:
+                        # Re-search with full window
+                        value = -1 * await principal_variation_search_async(
+                            game_board, depth - 1, -beta, -alpha, -colour, order_type)
+                        update_alpha = True
 
-            undo_last_move()
+            unmake_move()
 
             if value is None:
                 return None
@@ -438,6 +675,7 @@ class GameAI:
                 best_move = move
 
             if best_value >= beta:
+                self.update_move_ordering(game_board, move, depth)
                 break
 
             if timeout:
@@ -452,7 +690,7 @@ class GameAI:
             else:
                 t_entry.type = TranspositionTableEntryType.lower_bound \
                     if best_value >= beta else TranspositionTableEntryType.exact
-                t_entry.best_move = best_move
+                t_entry.best_move = best_move.key
 
             t_entry.value = best_value
             t_entry.depth = depth
@@ -463,20 +701,26 @@ class GameAI:
 
     # region Pre-Sorted Moves
     def get_presorted_valid_moves(self, game_board, best_move):
+        # best_move may be an EvaluatedMove, a Move, a packed move key (see Move.get_move_key) or None
         if isinstance(best_move, EvaluatedMove):
-            bm = best_move.move if best_move else None
-            valid_moves = self.get_presorted_valid_moves(game_board, bm)
+            bm_key = best_move.move.key
+            valid_moves = self.get_presorted_valid_moves(game_board, bm_key)
             evaluated_moves = []
             for move in valid_moves:
-                evaluated_moves.append(best_move if move == bm else EvaluatedMove(move))
+                evaluated_moves.append(best_move if move.key == bm_key else EvaluatedMove(move))
             return evaluated_moves
 
-        elif isinstance(best_move, Move) or best_move is None:
+        elif isinstance(best_move, (Move, int)) or best_move is None:
+            best_move_key = best_move.key if isinstance(best_move, Move) else best_move
             valid_moves = game_board.get_valid_moves()
-            valid_moves = sorted(
-                valid_moves,
-                key=functools.cmp_to_key(lambda x, y: self.pre_sort_moves(x, y, game_board, best_move))
-            )
+
+            ply = game_board.search_ply
+            killers = self._killer_moves[ply] if ply < max_killer_plies else (None, None)
+            counter_move_index = self.get_counter_move_index(game_board)
+            counter_move = self._counter_moves[counter_move_index] if counter_move_index is not None else None
+
+            valid_moves = sorted(valid_moves, key=lambda x: self.get_move_ordering_key(
+                x, game_board, best_move_key, killers, counter_move))
             valid_moves = MoveSet(moves_list=valid_moves)
 
             # Too many moves, reduce branching factor:
@@ -486,25 +730,74 @@ class GameAI:
         else:
             raise ValueError("Invalid best_move.")
 
-    @staticmethod
-    def pre_sort_moves(a, b, game_board, best_move):
-        # Put the best move from a previous search first
-        if best_move is not None:
-            if a == best_move:
-                return -1
-            elif b == best_move:
-                return 1
-
-        # Put noisy moves first
-        noisy_a = game_board.is_noisy_move(a)
-        noisy_b = game_board.is_noisy_move(b)
-
-        if noisy_a and not noisy_b:
-            return -1
-        elif noisy_b and not noisy_a:
-            return 1
-
-        return 0
+    def get_move_ordering_key(self, move, game_board, best_move_key, killers=(None, None), counter_move=None):
+        # Lower keys sort first: the best move from a previous search, then noisy moves, killer moves,
+        # the counter move, and the rest. Ties within a tier are broken by history score.
+        key = move.key
+        if key == best_move_key:
+            return 0
+        if move.is_pass:
+            return 5 * max_history_score
+
+        history_score = self._history_scores[move.piece_id * num_cells + move.position.cell_id]
+        if self.is_noisy_move(game_board, move):
+            tier = 1
+        elif key == killers[0] or key == killers[1]:
+            tier = 2
+        elif key == counter_move:
+            tier = 3
+        else:
+            tier = 4
+        return tier * max_history_score - history_score
+
+    def get_counter_move_index(self, game_board):
+        # History index of the move that led to this position, if any:
+        piece_id = game_board.last_piece_moved_id
+        if piece_id == EnumUtils.invalid_piece:
+            return None
+
+        position = game_board.get_piece_by_id(piece_id).position
+        return None if position is None else piece_id * num_cells + position.cell_id
+
+    def update_move_ordering(self, game_board, move, depth):
+        # A quiet move caused a beta cutoff, so try it early in sibling and similar positions:
+        if move.is_pass or self.is_noisy_move(game_board, move):
+            return
+
+        key = move.key
+        ply = game_board.search_ply
+        if ply < max_killer_plies:
+            killers = self._killer_moves[ply]
+            if killers[0] != key:
+                killers[1] = killers[0]
+                killers[0] = key
+
+        index = move.piece_id * num_cells + move.position.cell_id
+        self._history_scores[index] = min(self._history_scores[index] + depth * depth, max_history_score - 1)
+
+        counter_move_index = self.get_counter_move_index(game_board)
+        if counter_move_index is not None:
+            self._counter_moves[counter_move_index] = key
+
+    def is_null_move_allowed(self, game_board):
+        # Passing is only a safe bound while the side to move could place a piece instead, and neither queen is
+        # close to being surrounded, outside of which Hive positions are prone to zugzwang:
+        return self.use_null_move_pruning and \
+            game_board.last_piece_moved_id != EnumUtils.invalid_piece and \
+            game_board.current_turn_queen_in_play and game_board.opponent_queen_in_play and \
+            game_board.current_turn_has_pieces_in_hand and \
+            game_board.max_queen_neighbours <= null_move_max_queen_neighbours
+
+    def is_noisy_move(self, game_board, move):
+        # Noisiness only depends on the board, so it's shared between move ordering and quiescence search:
+        key = (game_board.zobrist_key, move.key)
+        noisy = self._cached_noisy_moves.get(key)
+
+        if noisy is None:
+            if len(self._cached_noisy_moves) >= max_cached_noisy_moves:
+                self._cached_noisy_moves.clear()
+            noisy = self._cached_noisy_moves[key] = game_board.is_noisy_move(move)
+        return noisy
     # endregion
 
     # region Quiescence Search
@@ -516,9 +809,9 @@ class GameAI:
             return best_value
 
         # Optimize away "." accessors:
-        is_noisy_move = game_board.is_noisy_move
-        trusted_play = game_board.trusted_play
-        undo_last_move = game_board.undo_last_move
+        is_noisy_move = self.is_noisy_move
+        make_move = game_board.make_move
+        unmake_move = game_board.unmake_move
         quiescence_search_async = self.quiescence_search_async
 
         valid_moves = game_board.get_valid_moves()
@@ -526,6 +819,27 @@ class GameAI:
             self.log("Quiescence Search Valid Moves:")
             self.log(str(valid_moves))
 
+        if depth == 1:
+            # The noisy children are leaves, whose value is just their board score, so score them in batches.
+            # Most cutoffs come from the first child, so batches start small and double, and a cutoff between
+            # batches still skips the remaining children's metrics:
+            noisy_moves = [move for move in valid_moves if not move.is_pass and is_noisy_move(game_board, move)]
+            start, batch_size = 0, 1
+
+            while start < len(noisy_moves):
+                batch = noisy_moves[start:start + batch_size]
+                for score in self.calculate_board_scores_after_moves(game_board, batch):
+                    best_value = max(best_value, colour * score)
+                    alpha = max(alpha, best_value)
+
+                if alpha >= beta:
+                    break
+
+                start += batch_size
+                batch_size = min(batch_size * 2, max_quiescence_batch_size)
+
+            return best_value
+
         for move in valid_moves:
             if debug:
                 self.log("".join(["QS Evaluating: ", str(move)]))
@@ -533,10 +847,10 @@ class GameAI:
             if move.is_pass:
                 continue
 
-            if is_noisy_move(move):
-                trusted_play(move)
+            if is_noisy_move(game_board, move):
+                make_move(move)
                 value = -1 * await quiescence_search_async(game_board, depth - 1, -beta, -alpha, -colour)
-                undo_last_move()
+                unmake_move()
 
                 if value is None:
                     return None
@@ -561,83 +875,170 @@ class GameAI:
             elif game_board.board_state == "Draw":
                 return 0.0
 
-            # Attempt to retrieve board score from transposition table:
-            key = game_board.zobrist_key
+            # Ignore extended metrics for the Original profile in a mixed battle:
+            self.set_mixed_battle_use_extended(game_board)
+
+            # Attempt to retrieve board score from the cache:
+            key = self.get_board_score_key(game_board.zobrist_key, game_board.game_type)
             flag, score = self._cached_board_scores.try_lookup(key)
             if flag:
+                self.board_score_metrics.hit()
                 return score
-
-            # Ignore extended metrics for the Original profile in a mixed battle:
-            self.set_mixed_battle_use_extended(game_board)
+            self.board_score_metrics.miss()
 
             # Calculate metrics, then score:
             board_metrics = game_board.get_board_metrics()
-            score = self.calculate_board_score(None, board_metrics, self.start_metric_weights, self.end_metric_weights)
+            features = board_metrics.get_feature_vector()
+            start_vector, end_vector = self.get_compiled_metric_weights(game_board.game_type)
+            score = blend_scores(board_metrics.pieces_in_hand, board_metrics.pieces_in_play,
+                                 dot(start_vector, features), dot(end_vector, features))
             self._cached_board_scores.store(key, score)
             return score
 
         elif start_weights and end_weights:
-            end_score = self.calculate_board_score(None, board_metrics, end_weights=end_weights)
-
-            if board_metrics.pieces_in_hand == 0:
-                # In "end-game", no need to blend
-                return end_score
-            else:
-                # Pieces still in hand, blend start and end scores
-                start_score = self.calculate_board_score(None, board_metrics, start_weights=start_weights)
-                start_ratio = \
-                    board_metrics.pieces_in_hand / (board_metrics.pieces_in_hand + board_metrics.pieces_in_play)
-                end_ratio = 1 - start_ratio
-
-                return (start_ratio * start_score) + (end_ratio * end_score)
+            features = board_metrics.get_feature_vector()
+            return blend_scores(board_metrics.pieces_in_hand, board_metrics.pieces_in_play,
+                                dot(self.compile_metric_weights(start_weights, board_metrics.game_type), features),
+                                dot(self.compile_metric_weights(end_weights, board_metrics.game_type), features))
         else:
-            score = 0
             mw = start_weights if start_weights is not None else end_weights
-
-            # Optimize away "." accessors:
-            get_bug_type = EnumUtilsCls.get_bug_type
-            get_colour = EnumUtilsCls.get_colour
-            get = mw.get
-
-            # Optionally compute extended board metrics:
-            if self.game_type == "Extended" and self.mixed_battle_use_extended:
+            return dot(self.compile_metric_weights(mw, board_metrics.game_type), board_metrics.get_feature_vector())
+
+    def calculate_board_scores(self, feature_vectors, pieces_in_hand, game_type=None):
+        # Scores a batch of boards of game_type from their BoardMetrics feature vectors and pieces in hand:
+        start_vector, end_vector = self.get_compiled_metric_weights(game_type)
+
+        if np is None:
+            return [blend_scores(in_hand, num_piece_names - in_hand, dot(start_vector, f), dot(end_vector, f))
+                    for f, in_hand in zip(feature_vectors, pieces_in_hand)]
+
+        features = np.array(feature_vectors, dtype=float)
+        start_ratio = np.array(pieces_in_hand, dtype=float) / num_piece_names
+        start_scores, end_scores = features.dot(start_vector), features.dot(end_vector)
+
+        # In "end-game" (no pieces in hand) the blend reduces to the end score:
+        return (start_ratio * start_scores + (1 - start_ratio) * end_scores).tolist()
+
+    def calculate_board_scores_after_moves(self, game_board, moves):
+        # Same as calculate_board_score after each move, but the uncached boards are scored in one batch:
+        scores = [None] * len(moves)
+        make_move = game_board.make_move
+        unmake_move = game_board.unmake_move
+        try_lookup = self._cached_board_scores.try_lookup
+        get_board_score_key = self.get_board_score_key
+        metrics = self.board_score_metrics
+        batch_indices, batch_keys, feature_vectors, pieces_in_hand = [], [], [], []
+
+        for i, move in enumerate(moves):
+            make_move(move)
+
+            if game_board.game_is_over:
+                scores[i] = self.calculate_board_score(game_board)
+            else:
+                self.set_mixed_battle_use_extended(game_board)
+                key = get_board_score_key(game_board.zobrist_key, game_board.game_type)
+                flag, score = try_lookup(key)
+
+                if flag:
+                    metrics.hit()
+                    scores[i] = score
+                else:
+                    metrics.miss()
+                    board_metrics = game_board.get_board_metrics()
+                    batch_indices.append(i)
+                    batch_keys.append(key)
+                    feature_vectors.append(board_metrics.get_feature_vector())
+                    pieces_in_hand.append(board_metrics.pieces_in_hand)
+
+            unmake_move()
+
+        if batch_indices:
+            store = self._cached_board_scores.store
+            batch_scores = self.calculate_board_scores(feature_vectors, pieces_in_hand, game_board.game_type)
+
+            for i, key, score in zip(batch_indices, batch_keys, batch_scores):
+                scores[i] = score
+                store(key, score)
+        return scores
+
+    def get_compiled_metric_weights(self, game_type=None):
+        # Compiled per board layout, since a mixed battle scores Extended boards with Original weights:
+        key = (self.mixed_battle_use_extended, game_type or self.game_type)
+        compiled = self._compiled_metric_weights.get(key)
+
+        if compiled is None:
+            compiled = (self.compile_metric_weights(self.start_metric_weights, key[1]),
+                        self.compile_metric_weights(self.end_metric_weights, key[1]))
+            self._compiled_metric_weights[key] = compiled
+        return compiled
+
+    def get_board_score_key(self, zobrist_key, game_type=None):
+        # Tag the board with the weights that score it, so AIs with different weights can share cached scores:
+        key = (self.mixed_battle_use_extended, game_type or self.game_type)
+        fingerprint = self._weights_fingerprints.get(key)
+
+        if fingerprint is None:
+            fingerprint = get_weights_fingerprint(*self.get_compiled_metric_weights(key[1]))
+            self._weights_fingerprints[key] = fingerprint
+        return zobrist_key ^ fingerprint
+
+    def compile_metric_weights(self, metric_weights, game_type=None):
+        # Weight vector matching BoardMetrics.get_feature_vector for a board of game_type, with the colour signs
+        # folded in. Features this AI has no weights for are zero, e.g. an Original AI on an Extended board:
+        game_type = game_type or self.game_type
+        use_extended = self.game_type == "Extended" and self.mixed_battle_use_extended
+        weights = []
+
+        if game_type == "Extended":
+            if use_extended:
                 bmw_get = self.board_metric_weights.get
                 queen_bee_life_weight = bmw_get("queen_bee_life_weight")
                 queen_bee_tight_spaces_weight = bmw_get("queen_bee_tight_spaces_weight")
                 noisy_ring_weight = bmw_get("noisy_ring_weight")
 
-                score += board_metrics.black_queen_life * -queen_bee_life_weight
-                score += board_metrics.white_queen_life * queen_bee_life_weight
-                score += board_metrics.black_queen_tight_spaces * -queen_bee_tight_spaces_weight
-                score += board_metrics.white_queen_tight_spaces * queen_bee_tight_spaces_weight
-                score += board_metrics.black_noisy_ring * -noisy_ring_weight
-                score += board_metrics.white_noisy_ring * noisy_ring_weight
-
-            for piece_name in EnumUtils.piece_names:
-                if piece_name == 'INVALID':
-                    continue
-
-                bug_type = get_bug_type(piece_name)
-                colour_value = 1.0 if get_colour(piece_name) == "White" else -1.0
-
-                score += colour_value * get(bug_type, "in_play_weight") * board_metrics[piece_name].in_play
-                score += colour_value * get(bug_type, "is_pinned_weight") * board_metrics[piece_name].is_pinned
-                score += colour_value * get(bug_type, "is_covered_weight") * board_metrics[piece_name].is_covered
-                score += colour_value * get(bug_type, "noisy_move_weight") * board_metrics[piece_name].noisy_move_count
-                score += colour_value * get(bug_type, "quiet_move_weight") * board_metrics[piece_name].quiet_move_count
-                score += colour_value * get(bug_type, "friendly_neighbour_weight") \
-                                      * board_metrics[piece_name].friendly_neighbour_count
-                score += colour_value * get(bug_type, "enemy_neighbour_weight") \
-                                      * board_metrics[piece_name].enemy_neighbour_count
-
-                # Optionally compute extended piece metrics:
-                if self.game_type == "Extended" and self.mixed_battle_use_extended:
-                    score += colour_value * get(bug_type, "can_make_noisy_ring_weight") \
-                        * board_metrics[piece_name].can_make_noisy_ring
-                    score += colour_value * get(bug_type, "can_make_defense_ring_weight") \
-                        * board_metrics[piece_name].can_make_defense_ring
+                weights.extend([-queen_bee_life_weight, queen_bee_life_weight,
+                                -queen_bee_tight_spaces_weight, queen_bee_tight_spaces_weight,
+                                -noisy_ring_weight, noisy_ring_weight])
+            else:
+                weights.extend([0.0] * 6)
+
+        weight_max = metric_weights.weight_max
+        num_features = num_bug_type_weights if game_type == "Original" else extended_num_bug_type_weights
+        for piece_id in range(num_piece_names):
+            colour_value = 1.0 if piece_colours[piece_id] == 0 else -1.0
+            offset = piece_bug_types[piece_id] * weight_max
+
+            for i in range(num_features):
+                # Optionally use extended piece metrics:
+                if i < num_bug_type_weights or (use_extended and i < weight_max):
+                    weights.append(colour_value * metric_weights[offset + i])
+                else:
+                    weights.append(0.0)
+
+        return weights if np is None else np.array(weights, dtype=float)
+    # endregion
+
+
+def get_weights_fingerprint(*weight_vectors):
+    # 64-bit fingerprint of the weight values, mixed so it can be XOR-ed into a Zobrist key:
+    return mix_64(hash(tuple(float(w) for weights in weight_vectors for w in weights)) & mask_64)
+
+
+def dot(weights, features):
+    if np is None:
+        return sum(map(mul, weights, features))
+    return float(weights.dot(features))
 
-            return score
+
+def blend_scores(pieces_in_hand, pieces_in_play, start_score, end_score):
+    if pieces_in_hand == 0:
+        # In "end-game", no need to blend
+        return end_score
+
+    # Pieces still in hand, blend start and end scores
+    start_ratio = pieces_in_hand / (pieces_in_hand + pieces_in_play)
+    end_ratio = 1 - start_ratio
+    return (start_ratio * start_score) + (end_ratio * end_score)
 
 
 def modulate_in_play_weights(current_turn, bench_pieces, num_white_pieces, num_black_pieces, metric_weights):
@@ -657,3 +1058,30 @@ def modulate_in_play_weights(current_turn, bench_pieces, num_white_pieces, num_b
             bug_type = EnumUtilsCls.get_bug_type(piece_name)
             current_weight = metric_weights.get(bug_type, "in_play_weight")
             metric_weights.set(bug_type, "in_play_weight", current_weight + mod_val)
+
+
+def run_helper_search(ai_args, board_args, max_depth, order_type, max_time, sender):
+    battle_key, config, shared_table = ai_args
+    ai = GameAI(battle_key, config)
+    if shared_table is not None:
+        ai._transposition_table = shared_table
+
+    board_string, game_type, mixed_battle, extended_colour, last_piece_moved_id = board_args
+    game_board = GameBoard(board_string=board_string, game_type=game_type,
+                           mixed_battle=mixed_battle, extended_colour=extended_colour)
+    game_board._last_piece_moved = last_piece_moved_id
+
+    def on_helper_move_found(_, __, evaluated_move):
+        sender.send((evaluated_move.move.key, evaluated_move.score_after_move, evaluated_move.depth))
+
+    # Report iterations through the pipe, rather than to the engine's listeners:
+    ai.best_move_found = Broadcaster()
+    ai.best_move_found.on_change += on_helper_move_found
+
+    kwargs = {'order_type': order_type, 'start_time': datetime.datetime.now()}
+    if max_time is not None:
+        kwargs['max_time'] = max_time
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(ai.evaluate_moves_async(game_board, BestMoveParams(max_depth, 0, None), **kwargs))
+    sender.close()
@@ -1,7 +1,9 @@
 ﻿class GameAIConfig(object):
     __slots__ = "start_metric_weights", "end_metric_weights", \
                 "transposition_table_size_mb", "game_type", \
-                "max_branching_factor", "board_metric_weights", "use_heuristics"
+                "max_branching_factor", "board_metric_weights", "use_heuristics", \
+                "aspiration_window", "use_null_move_pruning", "use_late_move_reductions", \
+                "use_shared_transposition_table", "use_shared_board_scores"
 
     def __init__(self, start_weights, end_weights, t_table_size, game_type, **kwargs):
         self.start_metric_weights = start_weights
@@ -11,3 +13,8 @@
         self.max_branching_factor = kwargs.pop('b_factor', None)
         self.board_metric_weights = kwargs.pop('board_weights', None)
         self.use_heuristics = kwargs.pop('use_heuristics', None)
+        self.aspiration_window = kwargs.pop('aspiration_window', None)
+        self.use_null_move_pruning = kwargs.pop('null_move_pruning', None)
+        self.use_late_move_reductions = kwargs.pop('late_move_reductions', None)
+        self.use_shared_transposition_table = kwargs.pop('shared_t_table', None)
+        self.use_shared_board_scores = kwargs.pop('shared_board_scores', None)
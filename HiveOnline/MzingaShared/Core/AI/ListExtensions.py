@@ -1,7 +1,7 @@
 ﻿class ListExtensions:
     @staticmethod
     def get_enumerable_by_order_type(items, order_type):
-        length = items.count
+        length = len(items)
         i = 1 if order_type == "SkipOffset" and length > 1 else 0
 
         count = 0
@@ -0,0 +1,156 @@
+import os
+import struct
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+from MzingaShared.Core.CacheMetrics import CacheMetrics
+from MzingaShared.Core.AI.TranspositionTable import TranspositionTableEntry, default_size_in_bytes
+
+# Each slot is three 64-bit words: [key ^ data ^ value bits, data, value bits], where data packs
+# bits [0, 41) best move key (0 for none), [41, 43) entry type, [43, 59) depth and [59] a valid flag.
+# Slots are read and written without locks; a slot torn by a concurrent write fails the XOR check and is a miss.
+slots_per_bucket = 4
+slot_words = 3
+slot_struct = struct.Struct("<3Q")
+bucket_struct = struct.Struct("<%dQ" % (slots_per_bucket * slot_words))
+value_struct = struct.Struct("<d")
+bits_struct = struct.Struct("<Q")
+
+move_mask = (1 << 41) - 1
+type_shift = 41
+type_mask = 0x3
+depth_shift = 43
+depth_mask = 0xFFFF
+valid_flag = 1 << 59
+
+
+def value_to_bits(value):
+    return bits_struct.unpack(value_struct.pack(value))[0]
+
+
+def bits_to_value(bits):
+    return value_struct.unpack(bits_struct.pack(bits))[0]
+
+
+class SharedTranspositionTable(object):
+    # A fixed-size, bucketed transposition table on a multiprocessing.shared_memory buffer, so helper and worker
+    # processes can share entries without pickling. Pickling the table itself only sends the buffer's name.
+    __slots__ = "size_in_bytes", "capacity", "metrics", "_num_buckets", "_shm", "_buf", "_owner_pid"
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def count(self):
+        buf = self._buf
+        data_words = range(1, slots_per_bucket * slot_words, slot_words)
+        count = 0
+        for offset in range(0, self._num_buckets * bucket_struct.size, bucket_struct.size):
+            words = bucket_struct.unpack_from(buf, offset)
+            count += sum(1 for i in data_words if words[i] & valid_flag)
+        return count
+
+    @property
+    def usage(self):
+        return self.count / self.capacity
+
+    def __init__(self, size_in_bytes=default_size_in_bytes, name=None):
+        if shared_memory is None:
+            raise ImportError("SharedTranspositionTable requires multiprocessing.shared_memory (Python 3.8+).")
+        if size_in_bytes < bucket_struct.size:
+            raise ValueError("Invalid size_in_bytes.")
+
+        self._num_buckets = size_in_bytes // bucket_struct.size
+        self.size_in_bytes = self._num_buckets * bucket_struct.size
+        self.capacity = self._num_buckets * slots_per_bucket
+        self.metrics = CacheMetrics()
+
+        if name is None:
+            # New buffers are zero-filled, i.e. every slot is empty:
+            self._shm = shared_memory.SharedMemory(create=True, size=self.size_in_bytes)
+            self._owner_pid = os.getpid()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner_pid = None
+        self._buf = self._shm.buf
+
+    def __getstate__(self):
+        return self.size_in_bytes, self._shm.name
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __del__(self):
+        self.close()
+
+    def __repr__(self):
+        return "U: %d/%d (%2f) %s" % (self.count, self.capacity, self.usage, self.metrics)
+
+    def store(self, key, new_entry):
+        offset = (key % self._num_buckets) * bucket_struct.size
+        words = bucket_struct.unpack_from(self._buf, offset)
+        depth = min(max(new_entry.depth, 0), depth_mask)
+
+        # Replace the same key if the new entry is deeper, otherwise an empty slot, otherwise the shallowest slot:
+        empty_slot = None
+        shallowest_slot = None
+        shallowest_depth = depth_mask + 1
+        for slot in range(slots_per_bucket):
+            i = slot * slot_words
+            check, data, bits = words[i], words[i + 1], words[i + 2]
+
+            if not data & valid_flag:
+                if empty_slot is None:
+                    empty_slot = slot
+            elif check ^ data ^ bits == key:
+                if depth <= (data >> depth_shift) & depth_mask:
+                    return
+                self._store_slot(offset, slot, key, new_entry, depth)
+                self.metrics.update()
+                return
+            elif (data >> depth_shift) & depth_mask < shallowest_depth:
+                shallowest_slot = slot
+                shallowest_depth = (data >> depth_shift) & depth_mask
+
+        self._store_slot(offset, empty_slot if empty_slot is not None else shallowest_slot, key, new_entry, depth)
+        self.metrics.store()
+
+    def _store_slot(self, offset, slot, key, new_entry, depth):
+        move = new_entry.best_move & move_mask if new_entry.best_move is not None else 0
+        data = valid_flag | (depth << depth_shift) | (new_entry.type << type_shift) | move
+        bits = value_to_bits(new_entry.value)
+        slot_struct.pack_into(self._buf, offset + slot * slot_struct.size, key ^ data ^ bits, data, bits)
+
+    def try_lookup(self, key):
+        words = bucket_struct.unpack_from(self._buf, (key % self._num_buckets) * bucket_struct.size)
+
+        for i in range(0, slots_per_bucket * slot_words, slot_words):
+            check, data, bits = words[i], words[i + 1], words[i + 2]
+            if data & valid_flag and check ^ data ^ bits == key:
+                entry = TranspositionTableEntry()
+                entry.type = (data >> type_shift) & type_mask
+                entry.value = bits_to_value(bits)
+                entry.depth = (data >> depth_shift) & depth_mask
+                entry.best_move = (data & move_mask) or None
+                self.metrics.hit()
+                return True, entry
+
+        self.metrics.miss()
+        return False, None
+
+    def clear(self):
+        self._buf[:self.size_in_bytes] = bytes(self.size_in_bytes)
+        self.metrics.reset()
+
+    def close(self):
+        # Only the creating process unlinks the buffer, not forked copies of this object:
+        if getattr(self, "_buf", None) is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
@@ -1,9 +1,6 @@
-﻿import sys
-
-from MzingaShared.Core.FixedCache import FixedCache
+﻿from MzingaShared.Core.FixedCache import FixedCache, get_entry_size_in_bytes
 
 default_size_in_bytes = 32 * 1024 * 1024
-default_transposition_table_entry_size = 128
 
 
 def transposition_table_replace_entry_predicate(existing_entry, new_entry):
@@ -17,26 +14,38 @@ class TranspositionTableEntryType:
 
 
 class TranspositionTableEntry(object):
-    __slots__ = "type", "value", "depth", "best_move", "size_in_bytes"
+    __slots__ = "type", "value", "depth", "best_move"
 
     def __init__(self):
-        self.type = None       # 24
-        self.value = None      # 24
-        self.depth = None      # 24
-        self.best_move = None  # 56
-        self.size_in_bytes = 128
+        self.type = None
+        self.value = None
+        self.depth = None
+        self.best_move = None  # Packed move key (see Move.get_move_key)
+
+
+def measure_entry_size_in_bytes():
+    # A full-width entry, keyed by a 64-bit Zobrist key:
+    entry = TranspositionTableEntry()
+    entry.type = TranspositionTableEntryType.exact
+    entry.value = 0.5
+    entry.depth = 1
+    entry.best_move = 1 << 40
+    return get_entry_size_in_bytes(1 << 63, entry)
+
+
+transposition_table_entry_size_in_bytes = measure_entry_size_in_bytes()
 
 
 class TranspositionTable(FixedCache):
-    __slots__ = "fill_factor", "entry_size_in_bytes"
+    __slots__ = "fill_factor"
 
     def __init__(self, size_in_bytes=default_size_in_bytes, rep=transposition_table_replace_entry_predicate):
-        super().__init__(size_in_bytes, rep)
         self.fill_factor = 0.92  # To leave room for unaccounted for overhead and unused dictionary capacity
-        self.entry_size_in_bytes = (12 * sys.getsizeof(float)) + default_transposition_table_entry_size
+        super().__init__(self.get_capacity(size_in_bytes), rep,
+                         entry_size_in_bytes=transposition_table_entry_size_in_bytes)
 
     def get_capacity(self, size_in_bytes):
-        if size_in_bytes < self.entry_size_in_bytes:
+        if size_in_bytes < transposition_table_entry_size_in_bytes:
             raise ValueError("size_in_bytes")
 
-        return 1 + round(self.fill_factor * size_in_bytes / self.entry_size_in_bytes)
+        return 1 + round(self.fill_factor * size_in_bytes / transposition_table_entry_size_in_bytes)
@@ -1,4 +1,6 @@
 import queue
+from collections import deque
+from operator import attrgetter
 from typing import Union
 
 from MzingaShared.Core import Move as MoveCls, EnumUtils
@@ -6,21 +8,25 @@ from MzingaShared.Core.BoardMetrics import BoardMetrics
 from MzingaShared.Core.CacheMetricsSet import CacheMetricsSet
 from MzingaShared.Core.Move import Move
 from MzingaShared.Core.MoveSet import MoveSet
+from MzingaShared.Core.OccupancyGrid import OccupancyGrid
 from MzingaShared.Core.Piece import Piece
 from MzingaShared.Core import Position as PositionCls
-from MzingaShared.Core.Position import Position, parse as parse_position
+from MzingaShared.Core.Position import Position, neighbour_cell_ids, num_cells, parse as parse_position
 from MzingaShared.Core.ZobristHash import ZobristHash
 from MzingaShared.Core.EnumUtils import colours, colours_by_int, piece_names_by_int, piece_names, \
-                                        EnumUtils as EnumUtilsCls, rings, directions, num_piece_names, num_directions
+                                        EnumUtils as EnumUtilsCls, rings, directions, num_piece_names, num_directions, \
+                                        num_colours, bug_types, piece_short_names, piece_colours, piece_bug_types, \
+                                        piece_ids_by_colour, piece_order_predecessors, queen_bee_by_colour, \
+                                        invalid_piece, white_queen_bee, black_queen_bee
 
 board_states = ["NotStarted", "InProgress", "Draw", "WhiteWins", "BlackWins"]
+cell_id_key = attrgetter("cell_id")
 
 
 class Board:
     board_state = None
 
     game_type = None
-    dummy_queen = None
 
     mixed_battle = False
     extended_colour = None
@@ -29,17 +35,21 @@ class Board:
     _current_turn = 0
     _zobrist_hash = None
     _pieces = []
-    _pieces_by_position = {}
-    _last_piece_moved = list(piece_names.keys())[0]  # "INVALID"
+    _occupancy_grid = None
+    _contact_counts = None
+    _placement_frontiers = None
+    _neighbour_counts = None
+    _pieces_in_play_count = 0
+    _last_piece_moved = invalid_piece
 
     # CACHES
     valid_move_cache_metrics_set = None
     valid_move_cache_resets = 0
     _cached_valid_moves_by_piece = None
-    _cached_valid_placement_positions = None
-    _visited_placements = set()
+    _cached_movements_by_piece = None
     _cached_enemy_queen_neighbours = None
     _cached_friendly_queen_neighbours = None
+    _cached_pinned_pieces = None
     # END CACHES
 
     # STATE PROPERTIES
@@ -52,10 +62,10 @@ class Board:
         if value < 0:
             raise ValueError("Invalid value.")
 
-        old_colour = self.current_turn_colour
+        old_colour = self._current_turn % 2
         self._current_turn = value
 
-        if old_colour != self.current_turn_colour:
+        if old_colour != value % 2:
             self._zobrist_hash.toggle_turn()  # Turn has changed
 
         self.reset_caches()
@@ -145,36 +155,58 @@ class Board:
     def black_bench(self):
         return [piece_names_by_int.get(i) for i in range(EnumUtils.num_piece_names // 2, EnumUtils.num_piece_names)
                 if not self._pieces[i].in_play]
+
+    @property
+    def pinned_pieces(self):
+        pinned = self.get_pinned_pieces()
+        return [] if pinned is None else [piece.piece_name for piece in self._pieces if piece in pinned]
     # END PIECE ENUMERATION PROPERTIES
 
     # PIECE STATE PROPERTIES
     @property
     def white_queen_in_play(self):
-        return self.get_piece("WhiteQueenBee").in_play
+        return self._pieces[white_queen_bee].position is not None
 
     @property
     def black_queen_in_play(self):
-        return self.get_piece("BlackQueenBee").in_play
+        return self._pieces[black_queen_bee].position is not None
 
     @property
     def current_turn_queen_in_play(self):
-        a = self.current_turn_colour == "White" and self.white_queen_in_play
-        b = self.current_turn_colour == "Black" and self.black_queen_in_play
-        return a or b
+        return self._pieces[queen_bee_by_colour[self._current_turn % 2]].position is not None
 
     @property
     def opponent_queen_in_play(self):
-        a = self.current_turn_colour == "White" and self.black_queen_in_play
-        b = self.current_turn_colour == "Black" and self.white_queen_in_play
-        return a or b
+        return self._pieces[queen_bee_by_colour[1 - self._current_turn % 2]].position is not None
+
+    @property
+    def current_turn_has_pieces_in_hand(self):
+        half = EnumUtils.num_piece_names // 2
+        start = (self._current_turn % 2) * half
+        pieces = self._pieces
+        return any(pieces[i] is not None and pieces[i].position is None for i in range(start, start + half))
+
+    @property
+    def max_queen_neighbours(self):
+        white_counts, black_counts = self._neighbour_counts
+        count = 0
+        for queen_id in (white_queen_bee, black_queen_bee):
+            position = self._pieces[queen_id].position
+            if position is not None:
+                count = max(count, white_counts[position.cell_id] + black_counts[position.cell_id])
+        return count
 
     @property
     def last_piece_moved(self):
-        return self._last_piece_moved
+        return piece_names_by_int[self._last_piece_moved]
 
     @last_piece_moved.setter
     def last_piece_moved(self, value):
-        self._last_piece_moved = value
+        self._last_piece_moved = invalid_piece if value is None else piece_names[value]
+
+    @property
+    def last_piece_moved_id(self):
+        return self._last_piece_moved
     # END PIECE STATE PROPERTIES
 
     def init_state_vars(self, game_type, mixed_battle, extended_colour):
@@ -183,7 +215,6 @@ class Board:
 
         self.mixed_battle = mixed_battle
         self.extended_colour = extended_colour
-        self.dummy_queen = Piece("WhiteQueenBee")
 
         self._board_metrics = BoardMetrics(game_type)
         self._current_turn = 0
@@ -191,17 +222,25 @@ class Board:
         self._zobrist_hash = ZobristHash()
 
         self._pieces = []
-        self._pieces_by_position = {}
-        self._last_piece_moved = "INVALID"
+        self._occupancy_grid = OccupancyGrid()
+
+        # Per colour: number of that colour's top pieces touching each cell, and the empty cells valid for placing
+        self._contact_counts = [[0] * num_cells for _ in range(num_colours)]
+        self._placement_frontiers = [set() for _ in range(num_colours)]
+
+        # Per colour: number of that colour's ground pieces touching each cell, for neighbour and queen life metrics
+        self._neighbour_counts = [[0] * num_cells for _ in range(num_colours)]
+        self._pieces_in_play_count = 0
+        self._last_piece_moved = invalid_piece
 
         # CACHES
         self.valid_move_cache_metrics_set = CacheMetricsSet()
         self.valid_move_cache_resets = 0
         self._cached_valid_moves_by_piece = None
-        self._cached_valid_placement_positions = None
-        self._visited_placements = set()
+        self._cached_movements_by_piece = [None] * num_piece_names
         self._cached_enemy_queen_neighbours = None
         self._cached_friendly_queen_neighbours = None
+        self._cached_pinned_pieces = {}
 
     def __init__(self, board_string, game_type, mixed_battle=False, extended_colour=None):
         self.init_state_vars(game_type, mixed_battle, extended_colour)
@@ -243,7 +282,7 @@ class Board:
                 if parsed_piece.position.stack > 0 and not self.has_piece_at(parsed_piece.position.get_below()):
                     parsed_pieces.put(parsed_piece)
                 else:
-                    piece = self.get_piece(parsed_piece.piece_name)
+                    piece = self._pieces[parsed_piece.piece_id]
                     self.move_piece(piece, parsed_piece.position, True)
 
         if not self.is_one_hive():
@@ -272,11 +311,11 @@ class Board:
         else:
             return self._pieces[piece_names[value]]
 
+    def get_piece_by_id(self, piece_id):
+        return self._pieces[piece_id]
+
     def get_piece_internal(self, position):
-        try:
-            return self._pieces_by_position[position]
-        except KeyError:
-            return None
+        return self._occupancy_grid.get(position)
 
     def get_piece_on_top(self, value):
         if isinstance(value, Piece):
@@ -308,19 +347,27 @@ class Board:
             self.move_piece(piece, new_position, True)
         else:
             if piece.in_play:
-                # self._pieces_by_position[piece.position] = None
-                self._pieces_by_position.pop(piece.position)
+                piece_below = piece.piece_below
+                self._occupancy_grid.remove(piece.position)
 
-                if piece.piece_below is not None:
-                    piece.piece_below.piece_above = None
+                if piece_below is not None:
+                    piece_below.piece_above = None
                     piece.piece_below = None
 
                 # Remove from old position
-                self._zobrist_hash.toggle_piece(piece.piece_name, piece.position)
+                self._zobrist_hash.toggle_piece(piece.piece_id, piece.position)
+                self._update_placement_frontiers(piece.position, piece, piece_below)
+                self._pieces_in_play_count -= 1
+
+                if piece_below is None:
+                    counts = self._neighbour_counts[piece_colours[piece.piece_id]]
+                    for cell_id in neighbour_cell_ids[piece.position.cell_id]:
+                        counts[cell_id] -= 1
 
             piece.move(new_position)
             if piece.in_play:
-                self._pieces_by_position[piece.position] = piece
+                self._occupancy_grid.add(piece)
+                piece_below = None
 
                 if new_position.stack > 0:
                     pos_below = new_position.get_below()
@@ -329,7 +376,51 @@ class Board:
                     piece.piece_below = piece_below
 
                 # Add to new position
-                self._zobrist_hash.toggle_piece(piece.piece_name, piece.position)
+                self._zobrist_hash.toggle_piece(piece.piece_id, piece.position)
+                self._update_placement_frontiers(new_position, piece_below, piece)
+                self._pieces_in_play_count += 1
+
+                if piece_below is None:
+                    counts = self._neighbour_counts[piece_colours[piece.piece_id]]
+                    for cell_id in neighbour_cell_ids[new_position.cell_id]:
+                        counts[cell_id] += 1
+
+    def _update_placement_frontiers(self, position, old_top_piece, new_top_piece):
+        # The top piece at position changed from old_top_piece to new_top_piece (either may be None):
+        old_colour = piece_colours[old_top_piece.piece_id] if old_top_piece is not None else None
+        new_colour = piece_colours[new_top_piece.piece_id] if new_top_piece is not None else None
+
+        if old_colour != new_colour:
+            cell_ids = neighbour_cell_ids[position.cell_id]
+            if old_colour is not None:
+                counts = self._contact_counts[old_colour]
+                for cell_id in cell_ids:
+                    counts[cell_id] -= 1
+            if new_colour is not None:
+                counts = self._contact_counts[new_colour]
+                for cell_id in cell_ids:
+                    counts[cell_id] += 1
+        elif position.stack > 0:
+            return  # Ground occupancy and contacts are unchanged
+
+        ground = self._occupancy_grid.levels[0]
+        white_counts, black_counts = self._contact_counts
+        white_frontier, black_frontier = self._placement_frontiers
+
+        if position.stack > 0:
+            position = Position(0, q=position.q, r=position.r)
+
+        for cell in (position,) + position.neighbours:
+            cell_id = cell.cell_id
+            if ground[cell_id] is None and white_counts[cell_id] > 0 and black_counts[cell_id] == 0:
+                white_frontier.add(cell)
+            else:
+                white_frontier.discard(cell)
+
+            if ground[cell_id] is None and black_counts[cell_id] > 0 and white_counts[cell_id] == 0:
+                black_frontier.add(cell)
+            else:
+                black_frontier.discard(cell)
 
     @staticmethod
     def piece_is_on_top(target_piece):
@@ -346,50 +437,123 @@ class Board:
 
         # Find a piece on the board to start checking
         starting_piece = None
-        for piece_name in list(piece_names.keys())[1:]:
-            piece = self.get_piece(piece_name)
+        for piece_id in range(num_piece_names):
+            piece = self._pieces[piece_id]
             if piece is None or piece.in_hand:
-                part_of_hive[piece_names[piece_name]] = True
+                part_of_hive[piece_id] = True
                 pieces_visited += 1
             else:
-                part_of_hive[piece_names[piece_name]] = False
+                part_of_hive[piece_id] = False
                 if starting_piece is None and piece.position.stack == 0:
                     # Save off a starting piece on the bottom
                     starting_piece = piece
-                    part_of_hive[piece_names[piece_name]] = True
+                    part_of_hive[piece_id] = True
                     pieces_visited += 1
 
         # There is at least one piece on the board
         if starting_piece is not None and pieces_visited < num_piece_names:
-            pieces_to_look_at = queue.Queue()
-            pieces_to_look_at.put(starting_piece)
+            pieces_to_look_at = deque()
+            pieces_to_look_at.append(starting_piece)
 
-            while not pieces_to_look_at.empty():
-                current_piece = pieces_to_look_at.get()
-                neighbour_at = current_piece.position.neighbour_at
+            while pieces_to_look_at:
+                current_piece = pieces_to_look_at.popleft()
 
                 # Check all pieces at this stack level
-                for i in range(num_directions):
-                    neighbor = neighbour_at(i)
+                for neighbor in current_piece.position.neighbours:
                     neighbor_piece = self.get_piece_internal(neighbor)
-                    if neighbor_piece is not None and not part_of_hive[piece_names[neighbor_piece.piece_name]]:
-                        pieces_to_look_at.put(neighbor_piece)
-                        part_of_hive[piece_names[neighbor_piece.piece_name]] = True
+                    if neighbor_piece is not None and not part_of_hive[neighbor_piece.piece_id]:
+                        pieces_to_look_at.append(neighbor_piece)
+                        part_of_hive[neighbor_piece.piece_id] = True
                         pieces_visited += 1
 
                 # Check for all pieces above this one
                 piece_above = current_piece.piece_above
                 while piece_above is not None:
-                    part_of_hive[piece_names[piece_above.piece_name]] = True
+                    part_of_hive[piece_above.piece_id] = True
                     pieces_visited += 1
                     piece_above = piece_above.piece_above
 
         return pieces_visited == num_piece_names
 
+    def get_pinned_pieces(self):
+        # Pinned pieces only change when the board does, so cache them per Zobrist key.
+        # Mock moves flip between a few keys, so more than one is kept:
+        key = self._zobrist_hash.value
+        cached_pinned_pieces = self._cached_pinned_pieces
+
+        try:
+            return cached_pinned_pieces[key]
+        except KeyError:
+            pass
+
+        if len(cached_pinned_pieces) >= max_cached_pinned_pieces:
+            cached_pinned_pieces.clear()
+
+        pinned = cached_pinned_pieces[key] = self._get_pinned_pieces_internal()
+        return pinned
+
+    def _get_pinned_pieces_internal(self):
+        # Find the articulation points of the hive in one pass (Tarjan), rather than removing each piece in turn.
+        # Returns None if the hive is already broken, since every piece would then "break" it.
+        ground = self._occupancy_grid.levels[0]
+        ground_pieces = [p for p in self._pieces if p.in_play and p.position.stack == 0]
+        pinned = set()
+
+        if not ground_pieces:
+            return pinned
+
+        adjacent = {}
+        for piece in ground_pieces:
+            neighbours = [ground[cell_id] for cell_id in neighbour_cell_ids[piece.position.cell_id]]
+            adjacent[piece] = [n for n in neighbours if n is not None]
+
+            # Removing a covered piece always strands the pieces above it:
+            if piece.piece_above is not None:
+                pinned.add(piece)
+
+        root = ground_pieces[0]
+        discovered = {root: 0}
+        low = {root: 0}
+        root_children = 0
+        to_visit = [(root, None, iter(adjacent[root]))]
+
+        while to_visit:
+            current_piece, parent, neighbours = to_visit[-1]
+            advanced = False
+
+            for n in neighbours:
+                if n not in discovered:
+                    discovered[n] = low[n] = len(discovered)
+                    to_visit.append((n, current_piece, iter(adjacent[n])))
+                    advanced = True
+                    break
+                elif n is not parent:
+                    low[current_piece] = min(low[current_piece], discovered[n])
+
+            if not advanced:
+                to_visit.pop()
+                if to_visit:
+                    parent_piece = to_visit[-1][0]
+                    low[parent_piece] = min(low[parent_piece], low[current_piece])
+
+                    if parent_piece is root:
+                        root_children += 1
+                    elif low[current_piece] >= discovered[parent_piece]:
+                        pinned.add(parent_piece)
+
+        if root_children > 1:
+            pinned.add(root)
+
+        if len(discovered) < len(ground_pieces):
+            return None
+        return pinned
+
     # METRICS
     def get_board_metrics(self):
         self._board_metrics.reset()
         self._board_metrics.board_state = self.board_state
+        self._board_metrics.pieces_in_play = self._pieces_in_play_count
+        self._board_metrics.pieces_in_hand = num_piece_names - self._pieces_in_play_count
 
         # Get the metrics for the current turn
         self._set_current_player_metrics()
@@ -398,9 +562,6 @@ class Board:
         valid_moves_by_piece = self._cached_valid_moves_by_piece
         self._cached_valid_moves_by_piece = None
 
-        valid_placement_positions = self._cached_valid_placement_positions
-        self._cached_valid_placement_positions = None
-
         enemy_queen_neighbours = self._cached_enemy_queen_neighbours
         self._cached_enemy_queen_neighbours = None
 
@@ -408,7 +569,7 @@ class Board:
         self._cached_friendly_queen_neighbours = None
 
         last_piece_moved = self._last_piece_moved
-        self._last_piece_moved = list(piece_names.keys())[0]  # "INVALID"
+        self._last_piece_moved = invalid_piece
 
         # Spoof going to the next turn to get the opponent's metrics
         self._current_turn += 1
@@ -421,7 +582,6 @@ class Board:
         self._last_piece_moved = last_piece_moved
         self._cached_enemy_queen_neighbours = enemy_queen_neighbours
         self._cached_friendly_queen_neighbours = friendly_queen_neighbours
-        self._cached_valid_placement_positions = valid_placement_positions
         self._cached_valid_moves_by_piece = valid_moves_by_piece
 
         return self._board_metrics
@@ -432,43 +592,45 @@ class Board:
             self.get_queen_metrics()
             self.get_board_ring_metrics()
 
-        # Calculate piece metrics:
-        for piece_name in self.current_turn_pieces:
-            target_piece = self.get_piece(piece_name)
-            p = self._board_metrics[piece_name]
-
-            if target_piece is not None:
-                if target_piece.in_play:
-                    self._board_metrics.pieces_in_play += 1
-                    p.in_play = 1
-                else:
-                    self._board_metrics.pieces_in_hand += 1
-                    p.in_play = 0
-
-                # Set noisy/quiet move, and ring metric counts:
-                metric_counts = self.is_pinned(piece_name)
-                is_pinned, p.noisy_move_count, p.quiet_move_count = metric_counts[0:3]
-                if self.game_type == "Extended":
-                    p.can_make_noisy_ring, p.can_make_defense_ring = metric_counts[3:]
+        # Calculate piece metrics, only mobility and pins need move generation:
+        colour = self._current_turn % 2
+        friendly_counts = self._neighbour_counts[colour]
+        enemy_counts = self._neighbour_counts[1 - colour]
 
-                is_below = target_piece.in_play and target_piece.piece_above is not None
-                p.is_pinned = 1 if is_pinned else 0
-                p.is_covered = 1 if is_below else 0
+        for piece_id in piece_ids_by_colour[colour]:
+            target_piece = self._pieces[piece_id]
+            p = self._board_metrics[piece_id]
 
-                # Set neighbor counts
-                total, p.friendly_neighbour_count, p.enemy_neighbour_count = self.count_neighbors(piece=target_piece)
+            # Set noisy/quiet move, and ring metric counts:
+            metric_counts = self.is_pinned(piece_id)
+            is_pinned, p.noisy_move_count, p.quiet_move_count = metric_counts[0:3]
+            if self.game_type == "Extended":
+                p.can_make_noisy_ring, p.can_make_defense_ring = metric_counts[3:]
+            p.is_pinned = 1 if is_pinned else 0
+
+            if target_piece.in_play:
+                cell_id = target_piece.position.cell_id
+                p.in_play = 1
+                p.is_covered = 1 if target_piece.piece_above is not None else 0
+                p.friendly_neighbour_count = friendly_counts[cell_id]
+                p.enemy_neighbour_count = enemy_counts[cell_id]
+            else:
+                p.in_play = 0
+                p.is_covered = 0
+                p.friendly_neighbour_count = 0
+                p.enemy_neighbour_count = 0
 
-    def is_pinned(self, piece_name):
+    def is_pinned(self, piece_id):
         noisy_count, quiet_count = 0, 0
         can_make_noisy_ring, can_make_defense_ring = 0, 0
         is_pinned = True
         is_noisy_move, is_quiet_move = self.is_noisy_move, self.is_quiet_move
         makes_noisy_ring, makes_defense_ring = self.makes_noisy_ring, self.makes_defense_ring
 
-        for move in self.get_valid_moves(piece_name):
+        for move in self.get_valid_moves(piece_id):
             if move is None or move.is_pass:
                 continue
-            if move.piece_name == piece_name:
+            if move.piece_id == piece_id:
                 is_pinned = False
 
             if is_noisy_move(move):
@@ -477,7 +639,7 @@ class Board:
                 if self.game_type == "Original":
                     quiet_count += 1
                 else:
-                    if is_quiet_move(piece_name, move):
+                    if is_quiet_move(piece_id, move):
                         quiet_count += 1
 
             # Optionally compute extended piece metrics:
@@ -487,14 +649,14 @@ class Board:
                         can_make_noisy_ring = 1
 
                 if can_make_defense_ring != 1:
-                    if makes_defense_ring(piece_name, move):
+                    if makes_defense_ring(piece_id, move):
                         can_make_defense_ring = 1
 
         return is_pinned, noisy_count, quiet_count, can_make_noisy_ring, can_make_defense_ring
 
-    def is_quiet_move(self, piece_name, move):
-        moving_piece = self.get_piece(piece_name)
-        original_position = self.get_piece_position(piece_name)
+    def is_quiet_move(self, piece_id, move):
+        moving_piece = self._pieces[piece_id]
+        original_position = moving_piece.position
         if original_position is None:
             return True
 
@@ -512,8 +674,7 @@ class Board:
         # Determine enemy queen neighbours:
         if self._cached_enemy_queen_neighbours is None:
             self._cached_enemy_queen_neighbours = set()
-            enemy_queen_name = "BlackQueenBee" if self.current_turn_colour == "White" else "WhiteQueenBee"
-            enemy_queen_position = self.get_piece_position(enemy_queen_name)
+            enemy_queen_position = self._pieces[queen_bee_by_colour[1 - self._current_turn % 2]].position
 
             if enemy_queen_position is not None:
                 # Add queen's neighboring positions
@@ -524,14 +685,14 @@ class Board:
                     add(neighbour_at(i))
 
         move_to_adjacent = move.position in self._cached_enemy_queen_neighbours
-        piece_already_adjacent = self.get_piece_position(move.piece_name) in self._cached_enemy_queen_neighbours
+        moving_piece = self._pieces[move.piece_id]
+        piece_already_adjacent = moving_piece.position in self._cached_enemy_queen_neighbours
         classically_noisy = move_to_adjacent and not piece_already_adjacent
 
         if self.game_type == "Original":
             return classically_noisy
         # Extended AI checks for moves which trap pieces into a space adjacent to the enemy queen:
         else:
-            moving_piece = self.get_piece(move.piece_name)
             original_position = moving_piece.position
 
             # Avoid extra work if the move is already noisy in the original sense or the move is a placement:
@@ -557,7 +718,8 @@ class Board:
             return False
 
         origin = move.position
-        piece_colour = move.piece_name[0:5]
+        piece_id = move.piece_id
+        turn_colour = self._current_turn % 2
         get_piece_internal = self.get_piece_internal
 
         def analyze_ring():
@@ -569,26 +731,26 @@ class Board:
                 n = get_piece_internal(referent)
                 if n is None:
                     break
-                if n.piece_name != move.piece_name:
-                    ring_pieces.append(n.piece_name)
+                if n.piece_id != piece_id:
+                    ring_pieces.append(n.piece_id)
 
             # If the move makes a ring, check for queen bee presence and/or piece ratio:
             if len(ring_pieces) >= 5:
-                white_pcs = 1 if piece_colour == "White" else 0
+                white_pcs = 1 if piece_colours[piece_id] == white else 0
                 black_pcs = 1 - white_pcs
 
-                for piece_name in ring_pieces:
-                    ring_piece_colour = piece_name[0:5]
+                for ring_piece_id in ring_pieces:
+                    ring_piece_colour = piece_colours[ring_piece_id]
 
-                    if piece_name[-3:] == "Bee":
-                        return ring_piece_colour == self.current_turn_colour
-                    if ring_piece_colour == "White":
+                    if piece_bug_types[ring_piece_id] == queen_bee:
+                        return ring_piece_colour == turn_colour
+                    if ring_piece_colour == white:
                         white_pcs += 1
                     else:
                         black_pcs += 1
 
-                noisy_for_white = self.current_turn_colour == "White" and white_pcs > black_pcs
-                noisy_for_black = self.current_turn_colour == "Black" and black_pcs > white_pcs
+                noisy_for_white = turn_colour == white and white_pcs > black_pcs
+                noisy_for_black = turn_colour == black and black_pcs > white_pcs
                 if noisy_for_white or noisy_for_black:
                     return True
             return False
@@ -608,9 +770,9 @@ class Board:
 
         return False
 
-    def makes_defense_ring(self, piece_name, move):
+    def makes_defense_ring(self, piece_id, move):
         # Determine which set of positions to inspect:
-        if piece_name[0:5] == self.current_turn_colour:
+        if piece_colours[piece_id] == self._current_turn % 2:
             queen_neighbour_set = self._cached_friendly_queen_neighbours
         else:
             queen_neighbour_set = self._cached_enemy_queen_neighbours
@@ -620,18 +782,18 @@ class Board:
 
         # Determine current number of non_sliding_neighbour_positions:
         tight_positions_1 = [p for p in queen_neighbour_set
-                             if self.get_piece_internal(p) is None and self.get_valid_slides_from_pos(p).count == 0]
+                             if self.get_piece_internal(p) is None and not self.can_slide_from(p)]
 
         # Mock move, check again, then undo:
-        piece = self.get_piece(piece_name)
+        piece = self._pieces[piece_id]
         original_pos = piece.position
         self.move_piece(piece, move.position, update_zobrist=False)
 
-        if piece_name[-3:] == "Bee":
+        if piece_bug_types[piece_id] == queen_bee:
             queen_neighbour_set = [move.position.neighbour_at(i) for i in EnumUtils.directions.values()]
 
         tight_positions_2 = [p for p in queen_neighbour_set
-                             if self.get_piece_internal(p) is None and self.get_valid_slides_from_pos(p).count == 0]
+                             if self.get_piece_internal(p) is None and not self.can_slide_from(p)]
         self.move_piece(piece, original_pos, update_zobrist=False)
 
         # If a non-sliding-neighbour position was added to the friendly queen's neighbours, a defense ring was formed:
@@ -647,16 +809,18 @@ class Board:
             enemy_count = 0
 
             if piece.in_play:
-                for i in range(EnumUtils.num_directions):
-                    neighbor = self.get_piece_internal(piece.position.neighbour_at(i))
-                    if neighbor is not None:
-                        if neighbor.colour == piece.colour:
-                            friendly_count += 1
-                        else:
-                            enemy_count += 1
+                colour = piece_colours[piece.piece_id]
+                cell_id = piece.position.cell_id
+                friendly_count = self._neighbour_counts[colour][cell_id]
+                enemy_count = self._neighbour_counts[1 - colour][cell_id]
 
             return friendly_count + enemy_count, friendly_count, enemy_count
 
+    def is_surrounded(self, piece):
+        # Same as count_neighbors(piece=piece)[0] == 6, from the ground occupancy mask:
+        return piece.in_play and \
+            get_occupied_mask(self._occupancy_grid.levels[0], neighbour_cell_ids[piece.position.cell_id]) == 0b111111
+
     def set_queen_neighbours(self, wq_neighbour_str, bq_neighbour_str):
         if wq_neighbour_str == "None":
             wq_neighbours = None
@@ -674,29 +838,26 @@ class Board:
     def count_queen_neighbours(self, queen_position, colour):
         neighbour_count = 0
         non_sliding_neighbour_positions = 0
-        friendly = self.current_turn_colour == colour
+        friendly = self._current_turn % 2 == colour
 
         if self._cached_friendly_queen_neighbours is None:
             self._cached_friendly_queen_neighbours = set()
 
         if queen_position is not None:
-            neighbour_at = queen_position.neighbour_at
-            fqn_add = self._cached_friendly_queen_neighbours.add
+            white_counts, black_counts = self._neighbour_counts
+            neighbour_count = white_counts[queen_position.cell_id] + black_counts[queen_position.cell_id]
 
-            for i in range(EnumUtils.num_directions):
-                pos = neighbour_at(i)
+            ground = self._occupancy_grid.levels[0]
+            fqn_add = self._cached_friendly_queen_neighbours.add
 
+            for pos in queen_position.neighbours:
                 # Build friendly_queen_neighbours cache:
                 if friendly:
                     fqn_add(pos)
 
-                # Count occupied neighbouring spaces and check empty neighbours for tightness:
-                if self.get_piece_internal(pos) is not None:
-                    neighbour_count += 1
-                else:
-                    valid_moves = self.get_valid_slides_from_pos(pos)
-                    if valid_moves.count == 0:
-                        non_sliding_neighbour_positions += 1
+                # Check empty neighbours for tightness:
+                if ground[pos.cell_id] is None and not self.can_slide_from(pos):
+                    non_sliding_neighbour_positions += 1
 
         return 6 - neighbour_count, non_sliding_neighbour_positions
 
@@ -710,13 +871,13 @@ class Board:
             piece_at_dir_i = self.get_piece_internal(neighbour_i_pos)
 
             if piece_at_dir_i is not None:
-                if piece_at_dir_i.colour == "White":
+                if piece_colours[piece_at_dir_i.piece_id] == white:
                     n_white += 1
                 else:
                     n_black += 1
 
-                if piece_at_dir_i.piece_name[-3::] == "Bee":
-                    neighbour_bees.add(piece_at_dir_i.colour)
+                if piece_bug_types[piece_at_dir_i.piece_id] == queen_bee:
+                    neighbour_bees.add(piece_colours[piece_at_dir_i.piece_id])
 
                 n_count += 1
             else:
@@ -731,12 +892,12 @@ class Board:
         empty_positions = set()
 
         # Find all empty positions:
-        for piece in self._pieces_by_position.values():
+        for piece in self._pieces:
             if piece is None or piece.in_hand:
                 continue
 
             neighbour_at = piece.position.neighbour_at
-            if bm[piece.piece_name].is_pinned == 1:
+            if bm[piece.piece_id].is_pinned == 1:
                 continue
 
             for i in range(EnumUtils.num_directions):
@@ -770,29 +931,29 @@ class Board:
 
                 # Additionally increment counter if bees are included in the ring:
                 for bee_colour in neighbour_bees:
-                    if bee_colour == "White":
+                    if bee_colour == white:
                         bm.white_noisy_ring += 1
                     else:
                         bm.black_noisy_ring += 1
 
     def get_queen_metrics(self):
-        white_queen_position = self.get_piece_position("WhiteQueenBee")
-        black_queen_position = self.get_piece_position("BlackQueenBee")
+        white_queen_position = self._pieces[white_queen_bee].position
+        black_queen_position = self._pieces[black_queen_bee].position
 
-        wq_metrics = self.count_queen_neighbours(white_queen_position, "White")
+        wq_metrics = self.count_queen_neighbours(white_queen_position, white)
         self._board_metrics.white_queen_life, self._board_metrics.white_queen_tight_spaces = wq_metrics
 
-        bq_metrics = self.count_queen_neighbours(black_queen_position, "Black")
+        bq_metrics = self.count_queen_neighbours(black_queen_position, black)
         self._board_metrics.black_queen_life, self._board_metrics.black_queen_tight_spaces = bq_metrics
 
     def get_trapped_neighbours(self, position, enemies_only=False):
         trapped_neighbours = []
-        for i in range(EnumUtils.num_directions):
-            n = self.get_piece_internal(position.neighbour_at(i))
+        for pos in position.neighbours:
+            n = self.get_piece_internal(pos)
             if n is None:
                 continue
             if not self.can_move_without_breaking_hive(n):
-                if enemies_only and n.colour != self.current_turn_colour:
+                if enemies_only and piece_colours[n.piece_id] != self._current_turn % 2:
                     trapped_neighbours.append(n)
                 else:
                     trapped_neighbours.append(n)
@@ -800,43 +961,36 @@ class Board:
     # END METRICS
 
     # VALID MOVES
-    def get_valid_moves(self, piece_name=None) -> MoveSet:
-        if piece_name:
+    def get_valid_moves(self, piece_id=None) -> MoveSet:
+        if piece_id is not None:
             if self._cached_valid_moves_by_piece is None:
-                self._cached_valid_moves_by_piece = MoveSet(size=EnumUtils.num_piece_names)
-
-            piece_name_index = piece_names[piece_name]
-            cached = self._cached_valid_moves_by_piece[piece_name_index]
-            null_entry = False
+                self._cached_valid_moves_by_piece = [None] * EnumUtils.num_piece_names
 
-            if isinstance(cached, Move):
-                null_entry = cached.is_pass
-            if isinstance(cached, MoveSet):
-                null_entry = cached.count == 0
+            cached = self._cached_valid_moves_by_piece[piece_id]
 
-            if cached is not None and not null_entry:
+            if cached is not None and cached.count != 0:
                 # MoveSet is cached in L1 cache
-                self.valid_move_cache_metrics_set["ValidMoves." + EnumUtilsCls.get_short_name(piece_name)].hit()
+                self.valid_move_cache_metrics_set[valid_moves_metric_names[piece_id]].hit()
             else:
                 # MoveSet is not cached in L1 cache
-                self.valid_move_cache_metrics_set["ValidMoves." + EnumUtilsCls.get_short_name(piece_name)].miss()
+                self.valid_move_cache_metrics_set[valid_moves_metric_names[piece_id]].miss()
 
                 # Calculate MoveSet
-                target_piece = self.get_piece(piece_name)
+                target_piece = self._pieces[piece_id]
                 moves = self.get_valid_moves_internal(target_piece)
                 moves.lock()
 
                 # Populate cache
-                self._cached_valid_moves_by_piece[piece_name_index] = moves
+                self._cached_valid_moves_by_piece[piece_id] = moves
 
-            return self._cached_valid_moves_by_piece[piece_name_index]
+            return self._cached_valid_moves_by_piece[piece_id]
         else:
             moves = MoveSet()
             add = moves.add
             pass_turn = MoveCls.pass_turn
 
             if self.game_in_progress:
-                list(map(add, list(map(self.get_valid_moves, self.current_turn_pieces))))
+                list(map(add, list(map(self.get_valid_moves, piece_ids_by_colour[self._current_turn % 2]))))
 
                 if moves.count == 0:
                     add(pass_turn())
@@ -846,18 +1000,17 @@ class Board:
 
     def get_valid_moves_internal(self, target_piece):
         # Optimize:
-        bug_type = target_piece.bug_type
-        colour = target_piece.colour
+        piece_id = target_piece.piece_id
+        colour = piece_colours[piece_id]
         in_hand = target_piece.in_hand
         in_play = target_piece.in_play
-        piece_name = target_piece.piece_name
 
         if target_piece is not None and self.game_in_progress:
-            if colour == self.current_turn_colour and self.placing_piece_in_order(target_piece):
+            if colour == self._current_turn % 2 and self.placing_piece_in_order(target_piece):
 
-                not_white_queen = in_hand and piece_name != "WhiteQueenBee"
-                not_black_queen = in_hand and piece_name != "BlackQueenBee"
-                not_last_moved = piece_name != self.last_piece_moved and in_play
+                not_white_queen = in_hand and piece_id != white_queen_bee
+                not_black_queen = in_hand and piece_id != black_queen_bee
+                not_last_moved = piece_id != self._last_piece_moved and in_play
 
                 # Optimize:
                 valid_moves = MoveSet()
@@ -866,22 +1019,22 @@ class Board:
                 origin = PositionCls.origin
 
                 # First move must be at the origin and not the White Queen Bee
-                if self.current_turn == 0 and colour == "White" and not_white_queen:
-                    add(Move(piece_name=piece_name, position=origin))
+                if self.current_turn == 0 and colour == white and not_white_queen:
+                    add(Move(piece_id=piece_id, position=origin))
                     return valid_moves
 
                 # Second move must be around the origin and not the Black Queen Bee
-                elif self.current_turn == 1 and colour == "Black" and not_black_queen:
+                elif self.current_turn == 1 and colour == black and not_black_queen:
 
                     for i in range(EnumUtils.num_directions):
                         neighbor = neighbour_at(i)
-                        add(Move(piece_name=piece_name, position=neighbor))
+                        add(Move(piece_id=piece_id, position=neighbor))
                     return valid_moves
 
                 elif (in_hand and (self.current_player_turn != 4 or  # Normal turn OR
                       (self.current_player_turn == 4 and  # Turn 4 and AND
                        (self.current_turn_queen_in_play or  # Queen is in play or you're trying to play it
-                        (not self.current_turn_queen_in_play and target_piece.bug_type == "QueenBee"))))):
+                        (not self.current_turn_queen_in_play and piece_bug_types[piece_id] == queen_bee))))):
                     # Look for valid new placements
                     return self._get_valid_placements(target_piece)
 
@@ -889,66 +1042,78 @@ class Board:
 
                     if self.can_move_without_breaking_hive(target_piece):
                         # Look for basic valid moves of played pieces who can move
-                        if bug_type == "QueenBee":
-                            add(self.get_valid_queen_bee_movements(target_piece))
-                        elif bug_type == "Spider":
-                            add(self.get_valid_spider_movements(target_piece))
-                        elif bug_type == "Beetle":
-                            add(self.get_valid_beetle_movements(target_piece))
-                        elif bug_type == "Grasshopper":
-                            add(self.get_valid_grasshopper_movements(target_piece))
-                        elif bug_type == "SoldierAnt":
-                            add(self.get_valid_soldier_ant_movements(target_piece))
+                        add(self.get_valid_movements(target_piece))
                     return valid_moves
         return MoveSet()
 
-    def _get_valid_placements(self, target_piece):
-        valid_moves = MoveSet()
-        target_colour = self.current_turn_colour
-
-        if target_piece.colour != target_colour:
-            return valid_moves
+    def get_valid_movements(self, target_piece):
+        # Movements only depend on the surrounding pieces, not the turn, so they're kept until invalidated:
+        piece_id = target_piece.piece_id
+        movements = self._cached_movements_by_piece[piece_id]
+
+        if movements is not None:
+            self.valid_move_cache_metrics_set["ValidMovements"].hit()
+            return movements
+
+        self.valid_move_cache_metrics_set["ValidMovements"].miss()
+        bug_type = piece_bug_types[piece_id]
+
+        if bug_type == queen_bee:
+            movements = self.get_valid_queen_bee_movements(target_piece)
+        elif bug_type == spider:
+            movements = self.get_valid_spider_movements(target_piece)
+        elif bug_type == beetle:
+            movements = self.get_valid_beetle_movements(target_piece)
+        elif bug_type == grasshopper:
+            movements = self.get_valid_grasshopper_movements(target_piece)
+        else:
+            movements = self.get_valid_soldier_ant_movements(target_piece)
 
-        if self._cached_valid_placement_positions is None or len(self._cached_valid_placement_positions) == 0:
-            self._cached_valid_placement_positions = set()
-            self._visited_placements.clear()
+        movements.lock()
+        self._cached_movements_by_piece[piece_id] = movements
+        return movements
 
-            for i in range(EnumUtils.num_piece_names):
-                piece = self._pieces[i]
+    def invalidate_cached_movements(self, moved_piece, original_position, new_position):
+        # Drop only the movements which could see the changed cells. Call this after a real (not mocked) move.
+        cached_movements = self._cached_movements_by_piece
+        changed_positions = [p for p in (original_position, new_position) if p is not None]
 
-                valid_piece = piece is not None and piece.in_play
+        for i in range(num_piece_names):
+            if cached_movements[i] is None:
+                continue
 
-                # Piece is in play, on the top and is the right color, look through neighbors
-                if valid_piece and self.piece_is_on_top(piece) and piece.colour == target_colour:
-                    bottom_position = self.get_piece_on_bottom(piece).position
-                    self._visited_placements.add(bottom_position)
+            piece = self._pieces[i]
+            bug_type = piece_bug_types[i]
+            if piece is moved_piece or piece.in_hand or bug_type == soldier_ant:
+                cached_movements[i] = None
+                continue
 
-                    for j in range(EnumUtils.num_directions):
-                        neighbor = bottom_position.neighbour_at(j)
+            piece_position = piece.position
+            max_distance = movement_dependency_distances[bug_type]
 
-                        # Neighboring position is a potential, verify its neighbors are empty or same color
-                        old_len = len(self._visited_placements)
-                        self._visited_placements.add(neighbor)
+            for changed_position in changed_positions:
+                if max_distance is None:
+                    affected = piece_position.is_in_line_with(changed_position)  # Grasshopper jump lines
+                else:
+                    affected = piece_position.distance_to(changed_position) <= max_distance
 
-                        if len(self._visited_placements) > old_len and not self.has_piece_at(neighbor):
-                            valid_placement = True
-                            for k in range(EnumUtils.num_directions):
-                                surrounding_position = neighbor.neighbour_at(k)
-                                surrounding_piece = self.get_piece_on_top_internal(surrounding_position)
+                if affected:
+                    cached_movements[i] = None
+                    break
 
-                                if surrounding_piece is not None and surrounding_piece.colour != target_colour:
-                                    valid_placement = False
-                                    break
+    def _get_valid_placements(self, target_piece):
+        valid_moves = MoveSet()
+        target_colour = self._current_turn % 2
+        piece_id = target_piece.piece_id
 
-                            if valid_placement:
-                                self._cached_valid_placement_positions.add(neighbor)
+        if piece_colours[piece_id] != target_colour:
+            return valid_moves
 
-            self.valid_move_cache_metrics_set["ValidPlacements"].miss()
-        else:
-            self.valid_move_cache_metrics_set["ValidPlacements"].hit()
+        add = valid_moves.add
 
-        for valid_placement in self._cached_valid_placement_positions:
-            valid_moves.add(Move(piece_name=target_piece.piece_name, position=valid_placement))
+        # Sorted, so the order doesn't depend on which mock moves have touched the frontier:
+        for valid_placement in sorted(self._placement_frontiers[target_colour], key=cell_id_key):
+            add(Move(piece_id=piece_id, position=valid_placement))
 
         return valid_moves
 
@@ -958,21 +1123,40 @@ class Board:
 
     def get_valid_spider_movements(self, target_piece):
         valid_moves = MoveSet()
+        piece_id = target_piece.piece_id
 
-        # Get all slides up to 2 spots away
-        up_to_two = self.get_valid_slides(target_piece, 2)
+        for position in self.get_spider_destinations(target_piece.position).values():
+            valid_moves.add(Move(piece_id=piece_id, position=position))
 
-        if up_to_two.count > 0:
-            # Get all slides up to 3 spots away
-            up_to_three = self.get_valid_slides(target_piece, 3)
+        return valid_moves
 
-            if up_to_three.count > 0:
-                # Get all slides ONLY 3 spots away
-                up_to_three.remove(up_to_two)
+    def get_spider_destinations(self, starting_position, path_length=3):
+        # Walks every slide path of exactly path_length steps which never revisits a cell:
+        ground = self._occupancy_grid.levels[0]
+        start_id = starting_position.cell_id
 
-                if up_to_three.count > 0:
-                    valid_moves.add(up_to_three)
-        return valid_moves
+        start_piece = ground[start_id]
+        ground[start_id] = None
+
+        destinations = {}
+        paths = [(starting_position, (start_id,))]
+
+        while paths:
+            position, path = paths.pop()
+            cell_ids = neighbour_cell_ids[position.cell_id]
+            last_step = len(path) == path_length
+
+            for direction in slide_gates[get_occupied_mask(ground, cell_ids)]:
+                cell_id = cell_ids[direction]
+                if cell_id not in path:
+                    slide_position = position.neighbours[direction]
+                    if last_step:
+                        destinations[cell_id] = slide_position
+                    else:
+                        paths.append((slide_position, path + (cell_id,)))
+
+        ground[start_id] = start_piece
+        return destinations
 
     def get_valid_beetle_movements(self, target_piece):
         valid_moves = MoveSet()
@@ -1010,7 +1194,7 @@ class Board:
                 if not (go_down and are_down):
                     up_one_tier = new_position.stack == destination_height
                     target_position = new_position if up_one_tier else top_neighbor.position.get_above()
-                    target_move = Move(piece_name=target_piece.piece_name, position=target_position)
+                    target_move = Move(piece_id=target_piece.piece_id, position=target_position)
                     valid_moves.add(target_move)
 
         return valid_moves
@@ -1030,7 +1214,7 @@ class Board:
 
             if distance > 0:
                 # Can only move if there's at least one piece in the way
-                move = Move(piece_name=target_piece.piece_name, position=landing_position)
+                move = Move(piece_id=target_piece.piece_id, position=landing_position)
                 valid_moves.add(move)
 
         return valid_moves
@@ -1039,94 +1223,66 @@ class Board:
         # Get all slides all the way around
         return self.get_valid_slides(target_piece, max_range=None)
 
-    def get_valid_slides(self, target_piece, max_range=None, dummy=False):
+    def get_valid_slides(self, target_piece, max_range=None):
         valid_moves = MoveSet()
-        starting_position = target_piece.position
+        piece_id = target_piece.piece_id
 
-        visited_positions = set()
-        visited_positions.add(starting_position)
-        piece_name = target_piece.piece_name
-
-        # Avoid invoking self.move_piece when checking dummy_queen slides:
-        if dummy:
-            target_piece.move(None)
-            self.get_valid_slides_rec(piece_name, starting_position, visited_positions, 0, valid_moves, max_range)
-            target_piece.move(starting_position)
-        else:
-            self.move_piece(target_piece, None, False)
-            self.get_valid_slides_rec(piece_name, starting_position, visited_positions, 0, valid_moves, max_range)
-            self.move_piece(target_piece, starting_position, False)
+        for position in self.get_slide_destinations(target_piece.position, max_range).values():
+            valid_moves.add(Move(piece_id=piece_id, position=position))
 
         return valid_moves
 
-    def get_valid_slides_rec(self, target, current_pos, visited_positions, current_range, valid_moves, max_range=None):
-        if max_range is None or current_range < max_range:
-
-            # Optimize loop:
-            neighbour_at = current_pos.neighbour_at
-            right_of = EnumUtilsCls.right_of
-            left_of = EnumUtilsCls.left_of
-            has_piece_at = self.has_piece_at
-            vm_add = valid_moves.add
-            vp_add = visited_positions.add
-            get_valid_slides_rec = self.get_valid_slides_rec
-
-            for slide_direction in EnumUtils.directions:
-                slide_position = neighbour_at(slide_direction)
-
-                if slide_position not in visited_positions and not has_piece_at(slide_position):
-                    # Slide position is open
-                    right = right_of(slide_direction)
-                    left = left_of(slide_direction)
-
-                    right_occupied = has_piece_at(neighbour_at(right))
-                    left_occupied = has_piece_at(neighbour_at(left))
-
-                    if right_occupied != left_occupied:  # Hive is not "tight"
-                        # Can slide into slide position
-                        move = Move(piece_name=target, position=slide_position)
-
-                        old_len = valid_moves.count
-                        vm_add(move)
-
-                        if valid_moves.count > old_len:
-                            # Sliding from this position has not been tested yet
-                            vp_add(move.position)
-                            get_valid_slides_rec(
-                                target, slide_position, visited_positions, current_range + 1, valid_moves, max_range)
-
-    def get_valid_slides_from_pos(self, pos):
-        # Use dummy queen to check a position for 'tightness':
-        self.dummy_queen.move(pos)
-        valid_moves = self.get_valid_slides(self.dummy_queen, 1, dummy=True)
-        self.dummy_queen.move(None)
-        return valid_moves
+    def get_slide_destinations(self, starting_position, max_range=None):
+        # Breadth-first flood fill over ground cells, returns {cell_id: position} in discovery order:
+        ground = self._occupancy_grid.levels[0]
+        start_id = starting_position.cell_id
 
-    def can_move_without_breaking_hive(self, target_piece):
-        if target_piece.in_play and target_piece.position.stack == 0:
-            # Try edge heuristic
-            edges = 0
-            last_has_piece = None
+        # Lift the sliding piece out of the grid directly, so the Zobrist key is left untouched:
+        start_piece = ground[start_id]
+        ground[start_id] = None
 
-            neighbour_at = target_piece.position.neighbour_at
-            has_piece_at = self.has_piece_at
+        destinations = {}
+        visited = {start_id}
+        frontier = [starting_position]
+        current_range = 0
 
-            for i in range(EnumUtils.num_directions):
-                has_piece = has_piece_at(neighbour_at(i))
+        while frontier and (max_range is None or current_range < max_range):
+            next_frontier = []
+
+            for position in frontier:
+                cell_ids = neighbour_cell_ids[position.cell_id]
+
+                for direction in slide_gates[get_occupied_mask(ground, cell_ids)]:
+                    cell_id = cell_ids[direction]
+                    if cell_id not in visited:
+                        visited.add(cell_id)
+                        slide_position = position.neighbours[direction]
+                        destinations[cell_id] = slide_position
+                        next_frontier.append(slide_position)
 
-                if last_has_piece is not None:
-                    if last_has_piece != has_piece:
-                        edges += 1
+            frontier = next_frontier
+            current_range += 1
 
-                        if edges > 2:
-                            break
+        ground[start_id] = start_piece
+        return destinations
 
-                last_has_piece = has_piece
+    def can_slide_from(self, pos):
+        # True if a ground piece at pos (ignoring whatever is there) could slide anywhere:
+        ground = self._occupancy_grid.levels[0]
+        return len(slide_gates[get_occupied_mask(ground, neighbour_cell_ids[pos.cell_id])]) > 0
 
-            if edges <= 2:
+    def can_move_without_breaking_hive(self, target_piece):
+        if target_piece.in_play and target_piece.position.stack == 0:
+            # Try edge heuristic
+            ground = self._occupancy_grid.levels[0]
+            if few_edge_masks[get_occupied_mask(ground, neighbour_cell_ids[target_piece.position.cell_id])]:
                 return True
 
-            # Temporarily remove piece from board
+            pinned_pieces = self.get_pinned_pieces()
+            if pinned_pieces is not None:
+                return target_piece not in pinned_pieces
+
+            # Hive is already broken, temporarily remove piece from board
             original_position = target_piece.position
             self.move_piece(target_piece, None, False)
 
@@ -1139,37 +1295,68 @@ class Board:
 
         return True
 
-    # noinspection PyMethodMayBeStatic
     def placing_piece_in_order(self, target_piece):
         if target_piece.in_hand:
-            try:
-                return eval(piece_order_dict[target_piece.piece_name])
-            except KeyError:
-                pass
+            predecessor = piece_order_predecessors[target_piece.piece_id]
+            if predecessor != invalid_piece:
+                return self._pieces[predecessor].in_play
         return True
 
     def reset_caches(self):
+        # Turn-dependent caches only, see invalidate_cached_movements:
         self._cached_valid_moves_by_piece = None
-        self._cached_valid_placement_positions = None
         self._cached_enemy_queen_neighbours = None
         self._cached_friendly_queen_neighbours = None
         self.valid_move_cache_resets += 1
 
 
-piece_order_dict = {
-    "WhiteSpider2": "self.get_piece(\"WhiteSpider1\").in_play",
-    "WhiteBeetle2": "self.get_piece(\"WhiteBeetle1\").in_play",
-    "WhiteGrasshopper2": "self.get_piece(\"WhiteGrasshopper1\").in_play",
-    "WhiteGrasshopper3": "self.get_piece(\"WhiteGrasshopper2\").in_play",
-    "WhiteSoldierAnt2": "self.get_piece(\"WhiteSoldierAnt1\").in_play",
-    "WhiteSoldierAnt3": "self.get_piece(\"WhiteSoldierAnt2\").in_play",
-    "BlackSpider2": "self.get_piece(\"BlackSpider1\").in_play",
-    "BlackBeetle2": "self.get_piece(\"BlackBeetle1\").in_play",
-    "BlackGrasshopper2": "self.get_piece(\"BlackGrasshopper1\").in_play",
-    "BlackGrasshopper3": "self.get_piece(\"BlackGrasshopper2\").in_play",
-    "BlackSoldierAnt2": "self.get_piece(\"BlackSoldierAnt1\").in_play",
-    "BlackSoldierAnt3": "self.get_piece(\"BlackSoldierAnt2\").in_play",
-}
+white, black = colours["White"], colours["Black"]
+max_cached_pinned_pieces = 64
+queen_bee, spider, beetle, grasshopper, soldier_ant = \
+    bug_types["QueenBee"], bug_types["Spider"], bug_types["Beetle"], bug_types["Grasshopper"], bug_types["SoldierAnt"]
+
+valid_moves_metric_names = ["ValidMoves." + short_name for short_name in piece_short_names]
+
+# How far from a piece a change can affect its movements (slide gates are one cell further than slides reach),
+# indexed by bug type; None means the piece can see along its jump lines instead:
+movement_dependency_distances = [None] * len(bug_types)
+movement_dependency_distances[queen_bee] = 1
+movement_dependency_distances[spider] = 3
+movement_dependency_distances[beetle] = 1
+
+
+def _get_slide_gates(mask):
+    # Directions a piece can slide through given a 6-bit mask of occupied neighbours:
+    # the destination must be empty, with exactly one of its two flanking cells occupied.
+    gates = []
+    for direction in range(num_directions):
+        left = (mask >> ((direction - 1) % num_directions)) & 1
+        right = (mask >> ((direction + 1) % num_directions)) & 1
+        if not (mask >> direction) & 1 and left != right:
+            gates.append(direction)
+    return tuple(gates)
+
+
+slide_gates = [_get_slide_gates(mask) for mask in range(1 << num_directions)]
+
+
+def _has_few_edges(mask):
+    # Whether the occupied neighbours change to empty (or back) at most twice, going round from direction 0 to 5.
+    # If so, the piece's neighbours are one contiguous group and moving it can't break the hive.
+    edges = 0
+    for direction in range(num_directions - 1):
+        if (mask >> direction) & 1 != (mask >> (direction + 1)) & 1:
+            edges += 1
+    return edges <= 2
+
+
+few_edge_masks = [_has_few_edges(mask) for mask in range(1 << num_directions)]
+
+
+def get_occupied_mask(ground, cell_ids):
+    n0, n1, n2, n3, n4, n5 = cell_ids
+    return (ground[n0] is not None) | (ground[n1] is not None) << 1 | (ground[n2] is not None) << 2 | \
+           (ground[n3] is not None) << 3 | (ground[n4] is not None) << 4 | (ground[n5] is not None) << 5
 
 
 class InvalidMoveException(Exception):
@@ -1,5 +1,14 @@
+from operator import attrgetter
+
 from MzingaShared.Core import EnumUtils
-from MzingaShared.Core.PieceMetrics import PieceMetrics, ExtendedPieceMetrics
+from MzingaShared.Core.PieceMetrics import PieceMetrics, ExtendedPieceMetrics, \
+                                           piece_metric_names, extended_piece_metric_names
+
+get_piece_features = attrgetter(*piece_metric_names)
+get_extended_piece_features = attrgetter(*extended_piece_metric_names)
+get_board_features = attrgetter("black_queen_life", "white_queen_life",
+                                "black_queen_tight_spaces", "white_queen_tight_spaces",
+                                "black_noisy_ring", "white_noisy_ring")
 
 
 class BoardMetrics(object):
@@ -53,8 +62,22 @@ class BoardMetrics(object):
         s = "".join(["".join([x, ';']) for x in base])
         return "".join([s, str(self._piece_metrics)])
 
-    def __getitem__(self, piece_name):
-        return self._piece_metrics[EnumUtils.piece_names[piece_name]]
+    def __getitem__(self, piece_id):
+        return self._piece_metrics[piece_id]
+
+    def get_feature_vector(self):
+        # Extended board features first, then each piece's features in piece id order:
+        if self.game_type == "Original":
+            features = []
+            get_features = get_piece_features
+        else:
+            features = list(get_board_features(self))
+            get_features = get_extended_piece_features
+
+        extend = features.extend
+        for piece_metrics in self._piece_metrics:
+            extend(get_features(piece_metrics))
+        return features
 
     def reset(self):
         self.board_state = "NotStarted"
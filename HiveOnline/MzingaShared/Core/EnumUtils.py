@@ -164,3 +164,26 @@ class EnumUtils:
             if bug_type in piece_name:
                 return bug_type
     # END BUG TYPES
+
+
+# PIECE ID LOOKUPS
+# Hot paths work on integer piece ids (see piece_names), these replace per-call name string work:
+invalid_piece = piece_names["INVALID"]
+white_queen_bee = piece_names["WhiteQueenBee"]
+black_queen_bee = piece_names["BlackQueenBee"]
+
+piece_colours = [colours[EnumUtils.get_colour(piece_names_by_int[i])] for i in range(num_piece_names)]
+piece_bug_types = [bug_types[EnumUtils.get_bug_type(piece_names_by_int[i])] for i in range(num_piece_names)]
+piece_ids_by_colour = [[i for i in range(num_piece_names) if piece_colours[i] == c] for c in range(num_colours)]
+queen_bee_by_colour = [white_queen_bee, black_queen_bee]
+
+
+def _get_order_predecessor(piece_name):
+    # Numbered pieces must be played in order, e.g. WhiteSoldierAnt2 needs WhiteSoldierAnt1 in play:
+    number = piece_name[-1]
+    if not number.isdigit():
+        return invalid_piece
+    return piece_names.get(piece_name[:-1] + str(int(number) - 1), invalid_piece)
+
+
+piece_order_predecessors = [_get_order_predecessor(piece_names_by_int[i]) for i in range(num_piece_names)]
@@ -1,20 +1,35 @@
+import sys
 import threading
+from collections import OrderedDict
 
 from MzingaShared.Core.CacheMetrics import CacheMetrics
 
 default_capacity = 1024
 
+# Measured per-item overhead of the OrderedDict holding the entries (hash table slot plus ordering links):
+_sample_count = 1 << 12
+ordered_dict_item_size_in_bytes = sys.getsizeof(OrderedDict.fromkeys(range(_sample_count))) / _sample_count
 
-class FixedCacheEntry(object):
-    __slots__ = "list_node", "entry"
 
-    def __init__(self, list_node, new_entry):
-        self.list_node = list_node
-        self.entry = new_entry
+def get_size_in_bytes(obj):
+    # The object itself plus whatever its __slots__ reference:
+    size = sys.getsizeof(obj)
+    slots = getattr(type(obj), "__slots__", ())
+    for slot in ((slots,) if isinstance(slots, str) else slots):
+        value = getattr(obj, slot, None)
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+def get_entry_size_in_bytes(key, entry):
+    return round(ordered_dict_item_size_in_bytes + sys.getsizeof(key) + get_size_in_bytes(entry))
 
 
 class FixedCache(object):
-    __slots__ = "capacity", "replace_entry_predicate", "metrics", "_dict", "_list", "_store_lock"
+    # Entries are kept in an OrderedDict from oldest to newest, so eviction and replacement are O(1).
+    # Entries are ordered by store (FIFO), or by store and lookup when lru is set.
+    __slots__ = "capacity", "replace_entry_predicate", "metrics", "lru", "entry_size_in_bytes", "_dict", "_store_lock"
 
     @property
     def count(self):
@@ -24,64 +39,62 @@ class FixedCache(object):
     def usage(self):
         return self.count / self.capacity
 
-    def __init__(self, capacity=default_capacity, replace_entry_predicate=None):
+    @property
+    def size_in_bytes(self):
+        # Estimated memory held by the cache, from the measured cost of an entry:
+        return self.count * (self.entry_size_in_bytes or 0)
+
+    def __init__(self, capacity=default_capacity, replace_entry_predicate=None, lru=False, entry_size_in_bytes=None):
         if capacity <= 0:
             raise ValueError("Invalid capacity.")
 
         self.capacity = capacity
         self.replace_entry_predicate = replace_entry_predicate  # comp. func to be implemented by inheriting classes
         self.metrics = CacheMetrics()
+        self.lru = lru
+        self.entry_size_in_bytes = entry_size_in_bytes  # Measured from the first stored entry if not given
 
-        self._dict = {}
-        self._list = []
+        self._dict = OrderedDict()
         self._store_lock = threading.Lock()
 
     def __repr__(self):
-        return "U: %d/%d (%2f) %s" % (self.count, self.capacity, self.usage, self.metrics)
+        return "U: %d/%d (%2f) %.1fMB %s" % (self.count, self.capacity, self.usage,
+                                             self.size_in_bytes / (1024 * 1024), self.metrics)
 
     def store(self, key, new_entry):
-        if key not in self._dict.keys():
+        entries = self._dict
+
+        if key not in entries:
             # New entry
-            self._store_lock.acquire()
-
-            if self.count == self.capacity:
-                # Make space
-                first = self._list[0]
-                self._dict.pop(first)
-                self._list.pop(0)
-
-            # Add
-            self.store_internal(key, new_entry)
-            self.metrics.store()
-            self._store_lock.release()
-        else:
-            # Existing entry
-            existing_entry = self._dict[key]
-
-            if self.replace_entry_predicate is None or self.replace_entry_predicate(existing_entry.entry, new_entry):
-                # Replace
-                if existing_entry.list_node in self._list:
-                    self._list.remove(existing_entry.list_node)
-                self.store_internal(key, new_entry)
-                self.metrics.update()
-
-    def store_internal(self, key, new_entry):
-        self._list.append(key)
-        list_node = self._list[-1]
-        wrapped_entry = FixedCacheEntry(list_node, new_entry)
-        self._dict[key] = wrapped_entry
+            with self._store_lock:
+                if len(entries) >= self.capacity:
+                    # Make space
+                    entries.popitem(last=False)
+
+                # Add
+                entries[key] = new_entry
+                self.metrics.store()
+
+            if self.entry_size_in_bytes is None:
+                self.entry_size_in_bytes = get_entry_size_in_bytes(key, new_entry)
+        elif self.replace_entry_predicate is None or self.replace_entry_predicate(entries[key], new_entry):
+            # Replace existing entry
+            entries[key] = new_entry
+            entries.move_to_end(key)
+            self.metrics.update()
 
     def try_lookup(self, key):
         try:
-            wrapped_entry = self._dict[key]
-            entry = wrapped_entry.entry
-            self.metrics.hit()
-            return True, entry
+            entry = self._dict[key]
         except KeyError:
             self.metrics.miss()
             return False, None
 
+        if self.lru:
+            self._dict.move_to_end(key)
+        self.metrics.hit()
+        return True, entry
+
     def clear(self):
-        self._dict = {}
-        self._list = []
+        self._dict = OrderedDict()
         self.metrics.reset()
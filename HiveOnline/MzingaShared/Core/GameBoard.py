@@ -1,15 +1,23 @@
-from MzingaShared.Core import Move, EnumUtils, NotationUtils
+from MzingaShared.Core import Move, NotationUtils
 from MzingaShared.Core.Board import Board, InvalidMoveException
 from MzingaShared.Core.BoardHistory import BoardHistory
+from MzingaShared.Core.EnumUtils import invalid_piece, white_queen_bee, black_queen_bee
 from Utils.Events import Broadcaster
 
+initial_undo_records = 64
+
 
 class GameBoard(Board):
     board_changed = Broadcaster()
 
     def on_board_changed(self):
-        white_queen_surrounded = self.count_neighbors(piece_name="WhiteQueenBee")[0] == 6
-        black_queen_surrounded = self.count_neighbors(piece_name="BlackQueenBee")[0] == 6
+        self.update_board_state()
+
+    board_changed.on_change += on_board_changed  # add a listener to the event
+
+    def update_board_state(self):
+        white_queen_surrounded = self.is_surrounded(self._pieces[white_queen_bee])
+        black_queen_surrounded = self.is_surrounded(self._pieces[black_queen_bee])
 
         if white_queen_surrounded and black_queen_surrounded:
             self.board_state = "Draw"
@@ -20,8 +28,6 @@ class GameBoard(Board):
         else:
             self.board_state = "NotStarted" if self.current_turn == 0 else "InProgress"
 
-    board_changed.on_change += on_board_changed  # add a listener to the event
-
     @property
     def board_history_count(self):
         return self._board_history.count
@@ -38,8 +44,15 @@ class GameBoard(Board):
     def last_move(self):
         return self._board_history.last_move
 
+    @property
+    def search_ply(self):
+        # Number of make_move calls not yet unmade
+        return self._undo_count
+
     def __init__(self, board_string=None, game_type=None, **kwargs):
         self.board_history = BoardHistory()
+        self._undo_records = [None] * initial_undo_records
+        self._undo_count = 0
         self.last_piece_moved = None
         self.board_state = None
 
@@ -63,8 +76,7 @@ class GameBoard(Board):
         if self.game_is_over:
             raise ValueError("You can't play, the game is over.")
 
-        valid_moves = self.get_valid_moves()
-        if not valid_moves.contains(move):
+        if not self.get_valid_moves(move.piece_id).contains(move):
             if move.colour != self.current_turn_colour:
                 raise InvalidMoveException(move, "It's not that player's turn.")
 
@@ -121,13 +133,14 @@ class GameBoard(Board):
         original_position = None
 
         if not move.is_pass:
-            target_piece = self.get_piece(move.piece_name)
+            target_piece = self._pieces[move.piece_id]
             original_position = target_piece.position
             self.move_piece(target_piece, move.position)
+            self.invalidate_cached_movements(target_piece, original_position, move.position)
 
         self._board_history.add(move, original_position, move_string)
         self.current_turn += 1
-        self.last_piece_moved = move.piece_name
+        self._last_piece_moved = move.piece_id
         self.board_changed.on_change.fire(self)  # fire event
 
     def undo_last_move(self):
@@ -136,19 +149,71 @@ class GameBoard(Board):
 
         item = self._board_history.undo_last_move()
         if not item.move.is_pass:
-            target_piece = self.get_piece(item.move.piece_name)
+            target_piece = self._pieces[item.move.piece_id]
             self.move_piece(target_piece, item.original_position)
+            self.invalidate_cached_movements(target_piece, item.move.position, item.original_position)
 
         previous_move = self._board_history.last_move
         if previous_move:
             previous_move = previous_move.move
-            self.last_piece_moved = previous_move.piece_name
+            self._last_piece_moved = previous_move.piece_id
         else:
-            self.last_piece_moved = "INVALID"
+            self._last_piece_moved = invalid_piece
 
         self.current_turn -= 1
         self.board_changed.on_change.fire(self)
 
+    # SEARCH MOVES
+    def make_move(self, move):
+        # Lean trusted_play for search: pushes a compact undo record instead of a BoardHistoryItem,
+        # and updates board_state directly instead of firing board_changed.
+        target_piece = None
+        original_position = None
+
+        if not move.is_pass:
+            target_piece = self._pieces[move.piece_id]
+            original_position = target_piece.position
+
+        undo_records = self._undo_records
+        if self._undo_count == len(undo_records):
+            undo_records.extend([None] * len(undo_records))
+
+        undo_records[self._undo_count] = (target_piece, original_position, self._zobrist_hash.value,
+                                          self.board_state, self._last_piece_moved)
+        self._undo_count += 1
+
+        if target_piece is not None:
+            self.move_piece(target_piece, move.position)
+            self.invalidate_cached_movements(target_piece, original_position, move.position)
+
+        self._current_turn += 1
+        self._zobrist_hash.toggle_turn()
+        self.reset_caches()
+
+        self._last_piece_moved = move.piece_id
+        self.update_board_state()
+
+    def unmake_move(self):
+        if self._undo_count == 0:
+            raise ValueError("You can't unmake any more moves.")
+
+        self._undo_count -= 1
+        target_piece, original_position, zobrist_key, board_state, last_piece_moved = \
+            self._undo_records[self._undo_count]
+
+        if target_piece is not None:
+            new_position = target_piece.position
+            self.move_piece(target_piece, original_position)
+            self.invalidate_cached_movements(target_piece, new_position, original_position)
+
+        self._current_turn -= 1
+        self._zobrist_hash.value = zobrist_key
+        self.reset_caches()
+
+        self.board_state = board_state
+        self._last_piece_moved = last_piece_moved
+    # END SEARCH MOVES
+
     def to_game_string(self):
         game_strs = []
         game_strs.extend([self.board_state, ';'])  # board state
@@ -1,22 +1,45 @@
-from MzingaShared.Core.EnumUtils import EnumUtils
+from MzingaShared.Core.EnumUtils import piece_short_names, invalid_piece
 from MzingaShared.Core.PiecePositionBase import PiecePositionBase
+from MzingaShared.Core.Position import Position
 
 pass_string = "PASS"
 _pass = None
 
+# Moves packed into a single int, stable across processes (unlike hashes of piece name strings).
+# Bits: [0] pass flag, [1, 6) piece id, [6, 9) stack, [9, 25) q, [25, 41) r, with q and r offset to be non-negative.
+pass_move_key = 1
+piece_id_shift = 1
+stack_shift = 6
+q_shift = 9
+r_shift = 25
+coord_offset = 1 << 15
+coord_mask = (1 << 16) - 1
+
 
 class Move(PiecePositionBase):
-    __slots__ = "_pass"
+    __slots__ = "_key"
 
     @property
     def is_pass(self):
-        return self == pass_turn()
+        return self.piece_id == invalid_piece
+
+    @property
+    def key(self):
+        key = self._key
+        if key is None:
+            key = self._key = get_move_key(self.piece_id, self.position)
+        return key
 
-    def __init__(self, piece_name=None, position=None, move_string=None):
+    def __init__(self, piece_name=None, position=None, move_string=None, piece_id=None):
         super().__init__()
-        self._pass = None
+        self._key = None
 
-        if piece_name is None and position is None and move_string is None:
+        if piece_id is not None:
+            # Trusted fast path for move generation:
+            self.piece_id = piece_id
+            self.position = position
+
+        elif piece_name is None and position is None and move_string is None:
             self.piece_name = "INVALID"
             self.position = None
 
@@ -43,7 +66,7 @@ class Move(PiecePositionBase):
             return pass_string
 
         pos = self.position if self.position else ""
-        return "%s[%s]" % (EnumUtils.get_short_name(self.piece_name), str(pos))
+        return "%s[%s]" % (piece_short_names[self.piece_id], str(pos))
 
     def init(self, piece_name, position):
         if piece_name == "INVALID":
@@ -55,14 +78,28 @@ class Move(PiecePositionBase):
         self.position = position
 
     def equals(self, move):
-        return False if move is None else self.piece_name == move.piece_name and self.position == move.position
+        return False if move is None else self.piece_id == move.piece_id and self.position is move.position
 
     def get_hash_code(self):
-        hash_code = 17
-        if self.piece_name != "INVALID":
-            hash_code = hash_code * 31 + hash(self.piece_name)
-            hash_code = hash_code * 31 + self.position.get_hash_code()
-        return hash_code
+        return self.key
+
+
+def get_move_key(piece_id, position):
+    if piece_id == invalid_piece:
+        return pass_move_key
+
+    return piece_id << piece_id_shift | position.stack << stack_shift | \
+        (position.q + coord_offset) << q_shift | (position.r + coord_offset) << r_shift
+
+
+def from_move_key(key):
+    if key & pass_move_key:
+        return pass_turn()
+
+    position = Position(stack=(key >> stack_shift) & 0b111,
+                        q=((key >> q_shift) & coord_mask) - coord_offset,
+                        r=((key >> r_shift) & coord_mask) - coord_offset)
+    return Move(piece_id=(key >> piece_id_shift) & 0b11111, position=position)
 
 
 def pass_turn():
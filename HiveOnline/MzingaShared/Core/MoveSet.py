@@ -3,22 +3,24 @@ from MzingaShared.Core.EnumUtils import piece_names
 
 
 class MoveSet(object):
-    __slots__ = "_moves", "is_locked"
+    # Moves are kept in an insertion-ordered dict keyed by Move.key, so iteration order is deterministic
+    # and membership, de-duplication and difference are O(1) per move.
+    __slots__ = "_moves", "_piece_mask", "is_locked"
 
     @property
     def count(self):
         return len(self._moves)
 
-    def __init__(self, size=None, move_set_string=None, moves_list=None):
+    def __init__(self, move_set_string=None, moves_list=None):
         self.is_locked = None
-        self._moves = []
+        self._moves = {}
+        self._piece_mask = 0  # Bit i is set when piece id i has at least one move
 
         if moves_list:
-            self._moves = [m for m in moves_list]
+            self.add(moves_list)
             return
 
         if not move_set_string:
-            self._moves = [Move()] * size if size else []
             self.is_locked = False
             return
 
@@ -27,17 +29,22 @@ class MoveSet(object):
 
         split = move_set_string.split(';')
         for s in split:
-            parse_move = Move(move_string=s)
-            self._moves.append(parse_move)
+            self.add(Move(move_string=s))
 
     def __getitem__(self, index):
-        return self._moves[index]
+        return list(self._moves.values())[index]
 
-    def __setitem__(self, key, value):
-        self._moves[key] = value
+    def __iter__(self):
+        return iter(self._moves.values())
+
+    def __len__(self):
+        return len(self._moves)
+
+    def __contains__(self, move):
+        return move.key in self._moves
 
     def __repr__(self):
-        s = "".join(["%s%c" % (str(m), ';') for m in self._moves])
+        s = "".join(["%s%c" % (str(m), ';') for m in self._moves.values()])
         return s[0:-1:]
 
     def add(self, value):
@@ -47,10 +54,18 @@ class MoveSet(object):
             raise MoveSetIsLockedException
 
         if isinstance(value, Move):
-            return self._moves.append(value)
+            self._moves.setdefault(value.key, value)
+            if not value.is_pass:
+                self._piece_mask |= 1 << value.piece_id
         else:
-            ext_iter = value._moves if isinstance(value, MoveSet) else value
-            self._moves.extend(ext_iter)
+            setdefault = self._moves.setdefault
+            if isinstance(value, MoveSet):
+                for key, move in value._moves.items():
+                    setdefault(key, move)
+                self._piece_mask |= value._piece_mask
+            else:
+                for move in value:
+                    self.add(move)
 
     def remove(self, value):
         if value is None:
@@ -58,32 +73,43 @@ class MoveSet(object):
         if self.is_locked:
             raise MoveSetIsLockedException
 
-        if isinstance(value, Move) and value in self._moves:
-            return self._moves.remove(value)
+        pop = self._moves.pop
+        if isinstance(value, Move):
+            pop(value.key, None)
         else:
-            diff_iter = value._moves if isinstance(value, MoveSet) else value
-            self._moves = list(set(self._moves) - set(diff_iter))
+            for key in (value._moves if isinstance(value, MoveSet) else [m.key for m in value]):
+                pop(key, None)
+        self._update_piece_mask()
 
     def contains(self, value):
         if value is None:
             raise ValueError("Invalid move or piece_name provided.")
 
         if isinstance(value, Move):
-            return value in self._moves
+            return value.key in self._moves
         elif value in piece_names.keys():  # value is a PieceName
-            if value in [m.piece_name for m in self._moves]:
-                return True
+            return value != "INVALID" and (self._piece_mask >> piece_names[value]) & 1 == 1
         return False
 
     def sort(self, sort_func, reverse):
-        self._moves = sorted(self._moves, key=sort_func, reverse=reverse)
+        moves = sorted(self._moves.values(), key=sort_func, reverse=reverse)
+        self._moves = {m.key: m for m in moves}
 
     def remove_range(self, start_idx):
-        self._moves = self._moves[start_idx::]
+        moves = list(self._moves.values())[start_idx::]
+        self._moves = {m.key: m for m in moves}
+        self._update_piece_mask()
 
     def lock(self):
         self.is_locked = True
 
+    def _update_piece_mask(self):
+        piece_mask = 0
+        for move in self._moves.values():
+            if not move.is_pass:
+                piece_mask |= 1 << move.piece_id
+        self._piece_mask = piece_mask
+
 
 class MoveSetIsLockedException(Exception):
     def __init__(self):
@@ -0,0 +1,32 @@
+from MzingaShared.Core.Position import max_stack_height, num_cells
+
+
+class OccupancyGrid(object):
+    # Array-backed piece storage: one flat list per stack level, indexed by Position.cell_id.
+    # Cell ids wrap around a bounded grid, which is wider than the hive can span, so they never collide:
+    __slots__ = "levels", "count"
+
+    def __init__(self):
+        self.levels = [[None] * num_cells for _ in range(max_stack_height)]
+        self.count = 0
+
+    def __getitem__(self, position):
+        return self.get(position)
+
+    def get(self, position):
+        if position.stack < max_stack_height:
+            return self.levels[position.stack][position.cell_id]
+        return None
+
+    def add(self, piece):
+        position = piece.position
+        self.levels[position.stack][position.cell_id] = piece
+        self.count += 1
+
+    def remove(self, position):
+        self.levels[position.stack][position.cell_id] = None
+        self.count -= 1
+
+    def clear(self):
+        self.levels = [[None] * num_cells for _ in range(max_stack_height)]
+        self.count = 0
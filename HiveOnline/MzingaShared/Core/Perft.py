@@ -0,0 +1,121 @@
+import time
+
+from MzingaShared.Core.GameBoard import GameBoard
+
+reference_positions = {
+    "Original": [
+        "START",
+        "InProgress;White[8];WQ[-2,2,0];WG1[0,0,0];WG2[1,-2,1];WA1[-1,1,0];WA2[-1,2,-1];BQ[2,-1,-1];BS1[3,-2,-1];"
+        "BB1[-4,4,0];BB2[-3,4,-1];BA1[1,-1,0];BA2[-3,3,0]",
+    ],
+    "Extended": [
+        "START",
+        "InProgress;White[8];WQ[2,-1,-1];WS1[3,-2,-1];WB1[0,0,0];WB2[1,-2,1];WG1[1,0,-1];WG2[1,-1,0];WA1[2,0,-2];"
+        "BQ[-3,2,1];BS1[-1,0,1];BS2[-4,2,2];BB1[-2,-1,3];BG1[-4,3,1];BA1[-2,1,1];BA2[-1,-1,2]",
+    ],
+}
+
+# Known-good leaf counts for each reference position, indexed by depth - 1, so move generator changes can be checked:
+reference_counts = {
+    "Original": [
+        [4, 96, 1440],
+        [55, 2270, 135097],
+    ],
+    "Extended": [
+        [4, 96, 1440],
+        [66, 2946, 197141],
+    ],
+}
+
+
+def get_reference_count(game_type, index, depth):
+    counts = reference_counts[game_type][index]
+    if depth == 0:
+        return 1
+    return counts[depth - 1] if depth <= len(counts) else None
+
+
+class PerftResult(object):
+    __slots__ = "depth", "nodes", "elapsed", "divide", "expected_nodes"
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def passed(self):
+        # None when there's no known-good count to check against:
+        return None if self.expected_nodes is None else self.nodes == self.expected_nodes
+
+    def __init__(self, depth, nodes, elapsed, divide=None, expected_nodes=None):
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.divide = divide
+        self.expected_nodes = expected_nodes
+
+    def __repr__(self):
+        result = "perft %d nodes %d time %.3fs nps %.0f" % (self.depth, self.nodes, self.elapsed, self.nodes_per_second)
+        if self.passed is False:
+            result += " MISMATCH expected %d" % self.expected_nodes
+        return result
+
+
+def perft(game_board, depth):
+    # Counts the leaf nodes of the move tree below game_board, depth plies deep:
+    if depth == 0:
+        return 1
+
+    valid_moves = game_board.get_valid_moves()
+    if depth == 1:
+        return valid_moves.count
+
+    nodes = 0
+    make_move = game_board.make_move
+    unmake_move = game_board.unmake_move
+    for move in valid_moves:
+        make_move(move)
+        nodes += perft(game_board, depth - 1)
+        unmake_move()
+    return nodes
+
+
+def perft_divide(game_board, depth):
+    # Leaf node counts below each root move, in move generation order:
+    if depth < 1:
+        raise ValueError("Invalid depth.")
+
+    divide = []
+    for move in game_board.get_valid_moves():
+        game_board.make_move(move)
+        divide.append((move, perft(game_board, depth - 1)))
+        game_board.unmake_move()
+    return divide
+
+
+def run_perft(game_board, depth, divide=False):
+    if game_board is None:
+        raise ValueError("Invalid game_board.")
+    if depth < 0:
+        raise ValueError("Invalid depth.")
+
+    start = time.perf_counter()
+    if divide and depth > 0:
+        moves = perft_divide(game_board, depth)
+        nodes = sum(count for _, count in moves)
+    else:
+        moves = None
+        nodes = perft(game_board, depth)
+
+    return PerftResult(depth, nodes, time.perf_counter() - start, moves)
+
+
+def run_reference_perft(depth, game_types=None, divide=False):
+    results = []
+    for game_type in (game_types or reference_positions.keys()):
+        for index, board_string in enumerate(reference_positions[game_type]):
+            game_board = GameBoard(board_string=board_string, game_type=game_type)
+            result = run_perft(game_board, depth, divide)
+            result.expected_nodes = get_reference_count(game_type, index, depth)
+            results.append((game_type, board_string, result))
+    return results
@@ -1,3 +1,9 @@
+# Feature names, in MetricWeights bug type weight order:
+piece_metric_names = ("in_play", "is_pinned", "is_covered", "noisy_move_count", "quiet_move_count",
+                      "friendly_neighbour_count", "enemy_neighbour_count")
+extended_piece_metric_names = piece_metric_names + ("can_make_noisy_ring", "can_make_defense_ring")
+
+
 class PieceMetrics(object):
     __slots__ = "in_play", "is_pinned", "is_covered", \
                 "noisy_move_count", "quiet_move_count", \
@@ -1,27 +1,32 @@
-from MzingaShared.Core.EnumUtils import piece_names, EnumUtils
+from MzingaShared.Core.EnumUtils import piece_names, piece_names_by_int, piece_short_names, colours_by_int, \
+                                        bug_types_by_int, piece_colours, piece_bug_types, invalid_piece, EnumUtils
 from MzingaShared.Core import Position
 
 
 class PiecePositionBase(object):
-    __slots__ = "position", "colour", "bug_type", "_piece_name"
+    __slots__ = "position", "piece_id"
 
     def __init__(self):
         self.position = None
-        self.colour = None
-        self.bug_type = None
-        self._piece_name = "INVALID"
+        self.piece_id = invalid_piece
 
     @property
     def piece_name(self):
-        return self._piece_name
+        return piece_names_by_int[self.piece_id]
 
     @piece_name.setter
     def piece_name(self, value):
-        self._piece_name = value
+        if value not in piece_names:
+            raise ValueError("Invalid piece_name.")
+        self.piece_id = piece_names[value]
 
-        if value != "INVALID":
-            self.colour = EnumUtils.get_colour(value)
-            self.bug_type = EnumUtils.get_bug_type(value)
+    @property
+    def colour(self):
+        return None if self.piece_id == invalid_piece else colours_by_int[piece_colours[self.piece_id]]
+
+    @property
+    def bug_type(self):
+        return None if self.piece_id == invalid_piece else bug_types_by_int[piece_bug_types[self.piece_id]]
 
     def parse(self, piece_string):
         if not self.try_parse(piece_string):
@@ -37,14 +42,14 @@ class PiecePositionBase(object):
             sep = piece_string.find('[')
             name_string = piece_string[0:sep:]
             position_string = (piece_string[sep::]).replace('[', '').replace(']', '')
-            self._piece_name = EnumUtils.parse_short_name(name_string)
+            self.piece_id = piece_names[EnumUtils.parse_short_name(name_string)]
             self.position = Position.parse(position_string)
             return True
         except ValueError:
-            self._piece_name = "INVALID"
+            self.piece_id = invalid_piece
             self.position = None
             return False
 
     def __repr__(self):
         pos = self.position if self.position else ""
-        return "%s[%s]" % (EnumUtils.get_short_name(self.piece_name), str(pos))
+        return "%s[%s]" % (piece_short_names[self.piece_id] if self.piece_id != invalid_piece else "", str(pos))
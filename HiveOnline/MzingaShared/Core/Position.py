@@ -1,9 +1,14 @@
-import queue
-
 from MzingaShared.Core.EnumUtils import directions, num_directions
 
 max_stack_height = 5
 
+# Cells map to small integer ids on a bounded grid which wraps around. With at most 22 pieces,
+# the cells probed around the hive are never grid_size apart, so their ids can't collide:
+grid_shift = 6
+grid_size = 1 << grid_shift
+grid_mask = grid_size - 1
+num_cells = grid_size * grid_size
+
 _neighbor_deltas = [
     [0, 1, -1],
     [1, 0, -1],
@@ -14,134 +19,136 @@ _neighbor_deltas = [
 ]
 
 
-class Position(object):
-    __slots__ = "_local_cache", "_shared_cache", "x", "y", "z", "q", "r", "stack"
+# Interning table, each (q, r, stack) maps to one canonical Position:
+_positions = {}
 
-    def __init__(self, stack, x=None, y=None, z=None, q=None, r=None):
-        self._local_cache = None
-        self._shared_cache = {}
 
+class Position(object):
+    __slots__ = "x", "y", "z", "q", "r", "stack", "cell_id", "_hash", "_neighbours", "_above", "_below", \
+                "zobrist_parts"
+
+    def __new__(cls, stack, x=None, y=None, z=None, q=None, r=None):
         if stack < 0:
             raise ValueError("Stack must be >= 0.")
-        self.stack = stack
 
         if x is not None:
-            self.x = x
-            self.y = y
-            self.z = z
-            self.q = x
-            self.r = z
-        elif q is not None:
-            self.x = q
-            self.z = r
-            self.y = 0 - q - r
+            q, r = x, z
+
+        key = (q, r, stack)
+        try:
+            return _positions[key]
+        except KeyError:
+            pass
+
+        self = super().__new__(cls)
+        self.stack = stack
+        self.x = q
+        self.y = 0 - q - r
+        self.z = r
+        self.q = q
+        self.r = r
+        self.cell_id = get_cell_id(q, r)
+
+        hash_code = 17 * 31 + q
+        hash_code = hash_code * 31 + r
+        self._hash = hash_code * 31 + stack
+
+        # Neighbour/above/below references are linked on first use:
+        self._neighbours = None
+        self._above = None
+        self._below = None
+
+        # Per-piece Zobrist keys are filled in by ZobristHash on first use:
+        self.zobrist_parts = None
+
+        _positions[key] = self
+        return self
+
+    def __reduce__(self):
+        # Unpickled/copied positions are re-interned:
+        return Position, (self.stack, self.x, self.y, self.z)
 
     def __eq__(self, other):
-        return other is None if self is None else self.equals(other)
+        return self is other
 
     def __ne__(self, other):
-        return not self == other
+        return self is not other
 
     def __hash__(self):
-        return self.get_hash_code()
+        return self._hash
 
     def __repr__(self):
         rep_strs = [str(self.x), ',', str(self.y), ',', str(self.z), ',', str(self.stack)]
         return "".join(rep_strs) if self.stack > 0 else "".join(rep_strs[0:-2:])
 
     def equals(self, pos):
-        return False if pos is None else self.q == pos.q and self.r == pos.r and self.stack == pos.stack
+        return self is pos
+
+    @property
+    def neighbours(self):
+        neighbours = self._neighbours
+        if neighbours is None:
+            q, r = self.q, self.r
+            neighbours = tuple(Position(0, q=q + dx, r=r + dz) for dx, _, dz in _neighbor_deltas)
+            self._neighbours = neighbours
+        return neighbours
 
     def cache_lookup(self, index):
-        if not self._local_cache:
-            if self not in list(self._shared_cache.keys()):
-                self._shared_cache[self] = [0] * (num_directions + 2)
-                self._local_cache = self._shared_cache[self]
-            else:
-                self._local_cache = self._shared_cache[self]
-
-        # created_new = False
-        new = False
-        cached = self._local_cache[index]
-        is_pos = isinstance(cached, Position)
-
-        if is_pos:
-            new = cached == self
-
-        if (not is_pos) or new:
-            if index < num_directions:
-                cx = self.x + _neighbor_deltas[index][0]
-                cy = self.y + _neighbor_deltas[index][1]
-                cz = self.z + _neighbor_deltas[index][2]
-                self._local_cache[index] = Position(stack=0, x=cx, y=cy, z=cz)
-                # created_new = True
-            elif index == num_directions:  # Above
-                self._local_cache[index] = Position(stack=self.stack + 1, x=self.x, y=self.y, z=self.z)
-                # created_new = True
-            elif index == num_directions + 1 and self.stack > 0:  # Below
-                self._local_cache[index] = Position(stack=self.stack - 1, x=self.x, y=self.y, z=self.z)
-                # created_new = True
-
-        return self._local_cache[index]
+        if index < num_directions:
+            return self.neighbours[index]
+        elif index == num_directions:
+            return self.get_above()
+        return self.get_below()
 
     def is_touching(self, piece_position):
         if not piece_position:
             raise ValueError("piece_position")
 
-        for i in range(num_directions):
-            if self.neighbour_at(i) == piece_position:
-                return True
-        return False
+        return piece_position in self.neighbours
+
+    def distance_to(self, position):
+        return max(abs(self.x - position.x), abs(self.y - position.y), abs(self.z - position.z))
+
+    def is_in_line_with(self, position):
+        return self.x == position.x or self.y == position.y or self.z == position.z
 
     def neighbour_at(self, direction):
+        neighbours = self._neighbours if self._neighbours is not None else self.neighbours
+
         if isinstance(direction, int):
-            direction = direction % num_directions
-            return self.cache_lookup(direction)
-        else:
-            return self.neighbour_at(directions[direction])
+            return neighbours[direction % num_directions]
+        return neighbours[directions[direction]]
 
     def get_above(self):
-        return self.cache_lookup(num_directions)
+        above = self._above
+        if above is None:
+            above = self._above = Position(self.stack + 1, q=self.q, r=self.r)
+        return above
 
     def get_below(self):
-        return self.cache_lookup(num_directions + 1)
+        if self.stack == 0:
+            return None
 
-    def get_hash_code(self):
-        hash_code = 17 * 31 + self.q
-        hash_code = hash_code * 31 + self.r
-        hash_code = hash_code * 31 + self.stack
-        return hash_code
+        below = self._below
+        if below is None:
+            below = self._below = Position(self.stack - 1, q=self.q, r=self.r)
+        return below
 
+    def get_hash_code(self):
+        return self._hash
 
-def get_unique_positions(count, max_stack=max_stack_height):
-    if count < 1:
-        raise ValueError("count must be >= 1")
-
-    positions = queue.Queue()
 
-    # Optimize away accessors:
-    result = set()
-    empty = positions.empty
-    get = positions.get
-    put = positions.put
-    add = result.add
+def get_cell_id(q, r):
+    return ((q & grid_mask) << grid_shift) | (r & grid_mask)
 
-    put(Position(stack=0, x=0, y=0, z=0))
 
-    while not empty():
-        pos = get()
-        cache_lookup = pos.cache_lookup
+def _get_neighbour_cell_ids(cell_id):
+    q, r = cell_id >> grid_shift, cell_id & grid_mask
+    return tuple(get_cell_id(q + dx, r + dz) for dx, _, dz in _neighbor_deltas)
 
-        for i in range(num_directions + 2):
-            if len(result) < count:
-                neighbor = cache_lookup(i)
-                old_len = len(result)
 
-                if neighbor:
-                    add(neighbor)
-                if len(result) > old_len and neighbor and neighbor.stack < max_stack:
-                    put(neighbor)
-    return result
+# Precomputed neighbour table over cell ids, in direction order:
+neighbour_cell_ids = [_get_neighbour_cell_ids(i) for i in range(num_cells)]
 
 
 origin = Position(stack=0, x=0, y=0, z=0)
@@ -164,7 +171,7 @@ def try_parse(position_string):
         split = list(filter(None, position_string.split(',')))
 
         if len(split) == 2:
-            position = Position(stack=0, q=split[0], r=split[1])
+            position = Position(stack=0, q=int(split[0]), r=int(split[1]))
             return True, position
 
         elif len(split) >= 3:
@@ -1,55 +1,62 @@
-from MzingaShared.Core import Position
-from MzingaShared.Core.EnumUtils import piece_names, num_piece_names
+from array import array
+
+from MzingaShared.Core.EnumUtils import num_piece_names, invalid_piece
 
 empty_board = 0
-num_unique_positions = Position.max_stack_height * num_piece_names * num_piece_names
+seed = 1
+mask_64 = 0xFFFFFFFFFFFFFFFF
 
-hash_part_by_turn_colour = None
-hash_part_by_last_moved_piece = None
-hash_part_by_position = None
 
+def mix_64(z):
+    # SplitMix64 finaliser
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & mask_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & mask_64
+    return z ^ (z >> 31)
 
-class ZobristHash(object):
-    __slots__ = "value", "_next", \
-                "_hash_part_by_turn_colour", \
-                "_hash_part_by_last_moved_piece", \
-                "_hash_part_by_position"
 
-    def rand_64(self):
-        self._next = self._next * 1103515245 + 12345
-        return self._next
+def rand_64(state):
+    # SplitMix64: returns (next_state, value), both kept within 64 bits
+    state = (state + 0x9E3779B97F4A7C15) & mask_64
+    return state, mix_64(state)
+
+
+def get_hash_parts(state, count):
+    parts = array('Q', bytes(8 * count))
+    for i in range(count):
+        state, parts[i] = rand_64(state)
+    return parts
 
-    def __init__(self):
-        self.value = empty_board
-        self._next = 1
 
-        # Only compute hash tables once:
-        global hash_part_by_turn_colour, hash_part_by_last_moved_piece, hash_part_by_position
+def get_position_hash_parts(position):
+    # One key per piece id, derived from the coordinates alone so any cell can be hashed:
+    state = mix_64(seed ^ (position.q & mask_64))
+    state = mix_64(state ^ (position.r & mask_64))
+    state = mix_64(state ^ position.stack)
+    return get_hash_parts(state, num_piece_names)
 
-        if hash_part_by_turn_colour is None:
-            self._hash_part_by_turn_colour = self.rand_64()
-            self._hash_part_by_last_moved_piece = [self.rand_64() for _ in range(num_piece_names)]
 
-            unique_positions = Position.get_unique_positions(num_unique_positions)
-            self._hash_part_by_position = {
-                i: {pos: self.rand_64() for pos in unique_positions}
-                for i in range(num_piece_names)
-            }
+# Only compute hash tables once:
+hash_table = get_hash_parts(seed, 1 + num_piece_names)
+hash_part_by_turn_colour = hash_table[0]
+hash_part_by_last_moved_piece = hash_table[1:]
 
-            hash_part_by_turn_colour = self._hash_part_by_turn_colour
-            hash_part_by_last_moved_piece = self._hash_part_by_last_moved_piece
-            hash_part_by_position = self._hash_part_by_position
-        else:
-            self._hash_part_by_turn_colour = hash_part_by_turn_colour
-            self._hash_part_by_last_moved_piece = hash_part_by_last_moved_piece
-            self._hash_part_by_position = hash_part_by_position
 
-    def toggle_piece(self, piece_name, position):
-        self.value ^= self._hash_part_by_position[piece_names[piece_name]][position]
+class ZobristHash(object):
+    __slots__ = "value"
+
+    def __init__(self):
+        self.value = empty_board
+
+    def toggle_piece(self, piece_id, position):
+        parts = position.zobrist_parts
+        if parts is None:
+            # Memoized on the interned Position:
+            parts = position.zobrist_parts = get_position_hash_parts(position)
+        self.value ^= parts[piece_id]
 
-    def toggle_last_moved_piece(self, piece_name):
-        if piece_name != "INVALID":
-            self.value ^= self._hash_part_by_last_moved_piece[piece_name]
+    def toggle_last_moved_piece(self, piece_id):
+        if piece_id != invalid_piece:
+            self.value ^= hash_part_by_last_moved_piece[piece_id]
 
     def toggle_turn(self):
-        self.value ^= self._hash_part_by_turn_colour
+        self.value ^= hash_part_by_turn_colour
@@ -6,6 +6,7 @@ from MzingaShared.Core import GameBoard
 from MzingaShared.Core.GameBoard import GameBoard as GameBoardCls
 from MzingaShared.Core.Move import Move
 from MzingaShared.Core import NotationUtils
+from MzingaShared.Core import Perft
 from MzingaShared.Engine import GameEngineConfig
 from Utils.Events import Broadcaster
 from Utils.TaskQueue import TaskQueue
@@ -106,6 +107,13 @@ class GameEngine:
                     return self.new_game()
                 else:
                     return self.new_game(board_string=split[1])
+            elif cmd == "perft":
+                if param_count == 1:
+                    return self.perft(split[1])
+                elif param_count >= 2 and split[2].lower() == "divide":
+                    return self.perft(split[1], divide=True)
+                else:
+                    self.raise_command_exception()
             elif cmd == "play":
                 self.raise_command_exception() if param_count < 1 else self.play("".join([s + " " for s in split[1:]]))
             else:
@@ -149,6 +157,7 @@ class GameEngine:
         print("pass")
         print("validmoves")
         print("bestmove")
+        print("perft")
         print("undo")
         print("options")
         print("exit")
@@ -221,6 +230,8 @@ class GameEngine:
         if 'max_time' in kwargs:
             kwargs['max_time'] = datetime.timedelta(seconds=int(kwargs.get('max_time')))
 
+        kwargs.setdefault('max_helper_threads', self.config.max_helper_threads)
+
         self._async_queue = TaskQueue()
         self._async_queue.enqueue(self._game_ai.get_best_move_async, self._game_board, **kwargs)
 
@@ -238,6 +249,17 @@ class GameEngine:
         print(NotationUtils.to_boardspace_move_string(self._game_board, best_move))
         return best_move
 
+    def perft(self, depth, divide=False):
+        self.check_board(check_game_over=False)
+
+        result = Perft.run_perft(self._game_board, int(depth), divide)
+        if result.divide is not None:
+            for move, nodes in result.divide:
+                print("%s %d" % (NotationUtils.to_boardspace_move_string(self._game_board, move), nodes))
+
+        print(result)
+        return result
+
     def undo(self, moves=1):
         self.check_board(check_game_over=False)
 
@@ -251,6 +273,9 @@ class GameEngine:
 
     def options_list(self):
         self.options_get("max_branching_factor")
+        self.options_get("aspiration_window")
+        self.options_get("null_move_pruning")
+        self.options_get("late_move_reductions")
         self.options_get("max_helper_threads")
         self.options_get("ponder_during_idle")
         self.options_get("transposition_table_size_mb")
@@ -284,8 +309,18 @@ class GameEngine:
         if opt_key == "max_branching_factor":
             self.config.parse_max_branching_factor_value(value)
             refresh_ai = True
+        elif opt_key == "aspiration_window":
+            self.config.parse_aspiration_window_value(value)
+            refresh_ai = True
+        elif opt_key == "null_move_pruning":
+            self.config.parse_null_move_pruning_value(value)
+            refresh_ai = True
+        elif opt_key == "late_move_reductions":
+            self.config.parse_late_move_reductions_value(value)
+            refresh_ai = True
         elif opt_key == "max_helper_threads":
             self.config.parse_max_helper_threads_value(value)
+            refresh_ai = True
         elif opt_key == "ponder_during_idle":
             self.config.parse_ponder_during_idle_value(value)
         elif opt_key == "transposition_table_size_mb":
@@ -351,6 +386,9 @@ class GameEngine:
 
 opt_key_dict = {
     "max_branching_factor": "self.config.get_max_branching_factor_value()",
+    "aspiration_window": "self.config.get_aspiration_window_value()",
+    "null_move_pruning": "self.config.get_null_move_pruning_value()",
+    "late_move_reductions": "self.config.get_late_move_reductions_value()",
     "max_helper_threads": "self.config.get_max_helper_threads_value()",
     "ponder_during_idle": "self.config.get_ponder_during_idle_value()",
     "transposition_table_size_mb": "self.config.get_transposition_table_size_mb_value()",
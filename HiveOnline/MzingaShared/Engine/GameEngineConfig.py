@@ -29,13 +29,15 @@ class GameEngineConfig:
 
     min_max_branching_factor = 1
 
+    min_aspiration_window = 0
+    max_aspiration_window = 10000
+
     _max_helper_threads: Union[int, None] = None
-    # Hard min is 0, hard max is (Environment.ProcessorCount / 2) - 1
-    hard_max = \
-        min(_max_helper_threads, max_max_helper_threads) if _max_helper_threads is not None else max_max_helper_threads
-    max_helper_threads = max(min_max_helper_threads, hard_max)
 
     max_branching_factor = None
+    aspiration_window = None
+    null_move_pruning = None
+    late_move_reductions = None
     report_intermediate_best_moves = False
     game_type = "Original"  # "Original"
 
@@ -80,6 +82,12 @@ class GameEngineConfig:
                     self.parse_ponder_during_idle_value(elem.text)
                 if elem.tag == "max_branching_factor":
                     self.parse_max_branching_factor_value(elem.text)
+                if elem.tag == "aspiration_window":
+                    self.parse_aspiration_window_value(elem.text)
+                if elem.tag == "null_move_pruning":
+                    self.parse_null_move_pruning_value(elem.text)
+                if elem.tag == "late_move_reductions":
+                    self.parse_late_move_reductions_value(elem.text)
                 if elem.tag == "report_intermediate_best_moves":
                     self.parse_report_intermediate_best_moves_value(elem.text)
                 if elem.tag == "game_type":
@@ -102,12 +110,19 @@ class GameEngineConfig:
         values = "%d;%d" % (self.min_transposition_table_size_mb, size)
         return r_type, value, values
 
+    @property
+    def max_helper_threads(self):
+        # Hard min is 0, hard max is (Environment.ProcessorCount / 2) - 1
+        hard_max = min(self._max_helper_threads, self.max_max_helper_threads) \
+            if self._max_helper_threads is not None else self.max_max_helper_threads
+        return max(self.min_max_helper_threads, hard_max)
+
     def parse_max_helper_threads_value(self, raw_value):
         try:
             val = int(raw_value)
             self._max_helper_threads = max(self.min_max_helper_threads, min(val, self.max_max_helper_threads))
         except ValueError:
-            if raw_value is None:
+            if raw_value is None or raw_value == "None":
                 self._max_helper_threads = 0
             elif raw_value == "Auto":
                 self._max_helper_threads = None
@@ -125,8 +140,9 @@ class GameEngineConfig:
         values = "Auto;None"
 
         i = 1
-        while i < self.max_max_helper_threads:
+        while i <= self.max_max_helper_threads:
             values += ";" + str(i)
+            i += 1
 
         return r_type, value, values
 
@@ -154,6 +170,39 @@ class GameEngineConfig:
         values = "%d;%d" % (self.min_max_branching_factor, GameAI.max_max_branching_factor)
         return r_type, value, values
 
+    def parse_aspiration_window_value(self, raw_value):
+        try:
+            val = int(raw_value)
+            self.aspiration_window = max(self.min_aspiration_window, min(val, self.max_aspiration_window))
+        except ValueError:
+            pass
+
+    def get_aspiration_window_value(self):
+        r_type = "int"
+        value = "%d" % (self.aspiration_window if self.aspiration_window is not None
+                        else GameAI.default_aspiration_window)
+        values = "%d;%d" % (self.min_aspiration_window, self.max_aspiration_window)
+        return r_type, value, values
+
+    def parse_null_move_pruning_value(self, raw_value):
+        self.null_move_pruning = raw_value == 'True'
+
+    def get_null_move_pruning_value(self):
+        r_type = "bool"
+        value = str(self.null_move_pruning if self.null_move_pruning is not None else GameAI.use_null_move_pruning)
+        values = ""
+        return r_type, value, values
+
+    def parse_late_move_reductions_value(self, raw_value):
+        self.late_move_reductions = raw_value == 'True'
+
+    def get_late_move_reductions_value(self):
+        r_type = "bool"
+        value = str(self.late_move_reductions if self.late_move_reductions is not None
+                    else GameAI.use_late_move_reductions)
+        values = ""
+        return r_type, value, values
+
     def parse_report_intermediate_best_moves_value(self, raw_value):
         try:
             self.report_intermediate_best_moves = raw_value == 'True'
@@ -180,7 +229,11 @@ class GameEngineConfig:
         kwargs = {
             "b_factor": self.max_branching_factor,
             "board_weights": self.board_metric_weights,
-            "use_heuristics": self.use_heuristics
+            "use_heuristics": self.use_heuristics,
+            "aspiration_window": self.aspiration_window,
+            "null_move_pruning": self.null_move_pruning,
+            "late_move_reductions": self.late_move_reductions,
+            "shared_t_table": self.max_helper_threads > 0
         }
 
         return GameAI("engine", config=GameAIConfig(
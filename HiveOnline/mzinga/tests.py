@@ -1,3 +1,184 @@
-from django.test import TestCase
+import asyncio
+import pickle
+
+from django.test import SimpleTestCase
+
+from MzingaShared.Core.AI.EvaluatedMove import EvaluatedMove
+from MzingaShared.Core.AI.EvaluatedMoveCollection import EvaluatedMoveCollection
+from MzingaShared.Core.AI.GameAI import GameAI, max_aspiration_researches
+from MzingaShared.Core.AI.GameAIConfig import GameAIConfig
+from MzingaShared.Core import Perft
+from MzingaShared.Core.GameBoard import GameBoard
+from MzingaShared.Engine import GameEngineConfig
 
 # Create your tests here.
+
+
+class MixedBattleBoardScoreTests(SimpleTestCase):
+    board_string = "InProgress;Black[2];WS1[0,0,0];WS2[0,-1,1];BS1[0,1,-1]"
+
+    def setUp(self):
+        config = GameEngineConfig.get_default_config("Original")
+        self.original_ai = GameAI("test", GameAIConfig(config.start_metric_weights, config.start_metric_weights,
+                                                       32, "Original", shared_board_scores=False))
+
+    def test_original_ai_scores_extended_mixed_battle_board(self):
+        # Mixed battles always play on an Extended board, whatever the AI's own game type:
+        mixed_board = GameBoard(board_string=self.board_string, game_type="Extended",
+                                mixed_battle=True, extended_colour="White")
+        original_board = GameBoard(board_string=self.board_string, game_type="Original")
+
+        score = self.original_ai.calculate_board_score(mixed_board)
+        self.assertAlmostEqual(score, self.original_ai.calculate_board_score(original_board))
+
+        moves = list(mixed_board.get_valid_moves())[:3]
+        batch_scores = self.original_ai.calculate_board_scores_after_moves(mixed_board, moves)
+        self.original_ai.reset_caches()
+        for move, batch_score in zip(moves, batch_scores):
+            mixed_board.make_move(move)
+            self.assertAlmostEqual(batch_score, self.original_ai.calculate_board_score(mixed_board))
+            mixed_board.unmake_move()
+
+
+class AspirationWindowTests(SimpleTestCase):
+    board_string = "InProgress;Black[2];WS1[0,0,0];WS2[0,-1,1];BS1[0,1,-1]"
+
+    def setUp(self):
+        config = GameEngineConfig.get_default_config("Original")
+        self.ai = GameAI("test", GameAIConfig(config.start_metric_weights, config.end_metric_weights,
+                                              32, "Original", shared_board_scores=False))
+        self.game_board = GameBoard(board_string=self.board_string, game_type="Original")
+        self.moves = list(self.game_board.get_valid_moves())[:3]
+
+    def evaluate_with_mocked_search(self, score):
+        # The mocked search always returns the same score, whatever the window:
+        windows = []
+
+        async def evaluate_moves_to_depth_async(game_board, depth, moves_to_evaluate, alpha, beta, **kwargs):
+            windows.append((alpha, beta))
+            if len(windows) > max_aspiration_researches + 2:
+                raise AssertionError("Re-searched window (%s, %s) with best score %s" % (alpha, beta, score))
+            evaluated_moves = EvaluatedMoveCollection()
+            evaluated_moves.add(evaluated_move=EvaluatedMove(self.moves[0], score, depth))
+            return evaluated_moves
+
+        previous_moves = EvaluatedMoveCollection()
+        previous_moves.add(evaluated_moves=[EvaluatedMove(move, 10.0 - i, 1) for i, move in enumerate(self.moves)],
+                           re_sort=False)
+
+        self.ai.evaluate_moves_to_depth_async = evaluate_moves_to_depth_async
+        evaluated_moves = asyncio.run(self.ai.evaluate_moves_with_aspiration_async(self.game_board, 2, previous_moves))
+        return evaluated_moves, windows
+
+    def test_forced_loss_is_not_researched(self):
+        evaluated_moves, windows = self.evaluate_with_mocked_search(float("-inf"))
+        self.assertEqual(evaluated_moves.best_move.score_after_move, float("-inf"))
+        self.assertEqual(len(windows), 1)
+
+    def test_forced_win_is_not_researched(self):
+        evaluated_moves, windows = self.evaluate_with_mocked_search(float("inf"))
+        self.assertEqual(evaluated_moves.best_move.score_after_move, float("inf"))
+        self.assertEqual(len(windows), 1)
+
+    def test_fail_low_widens_to_infinite_bound(self):
+        evaluated_moves, windows = self.evaluate_with_mocked_search(-1e9)
+        self.assertEqual(evaluated_moves.best_move.score_after_move, -1e9)
+        self.assertEqual(windows[-1][0], float("-inf"))
+
+
+class HelperSearchTests(SimpleTestCase):
+    def test_helper_ai_args_pickle_without_shared_transposition_table(self):
+        # Spawned helper processes (macOS and Windows) receive their inputs pickled:
+        config = GameEngineConfig.get_default_config("Original")
+        ai = GameAI("test", GameAIConfig(config.start_metric_weights, config.end_metric_weights, 8, "Original",
+                                         shared_t_table=False))
+        battle_key, helper_config, shared_table = pickle.loads(pickle.dumps(ai.get_helper_ai_args()))
+        self.assertIsNone(shared_table)
+
+        helper_ai = GameAI(battle_key, helper_config)
+        game_board = GameBoard(board_string="InProgress;Black[2];WS1[0,0,0];WS2[0,-1,1];BS1[0,1,-1]",
+                               game_type="Original")
+        self.assertAlmostEqual(helper_ai.calculate_board_score(game_board), ai.calculate_board_score(game_board))
+
+
+class PerftTests(SimpleTestCase):
+    def assert_reference_counts(self, depth):
+        for game_type, board_string, result in Perft.run_reference_perft(depth):
+            with self.subTest(game_type=game_type, board_string=board_string):
+                self.assertIsNotNone(result.expected_nodes)
+                self.assertEqual(result.nodes, result.expected_nodes)
+
+    def test_reference_counts_depth_2(self):
+        self.assert_reference_counts(2)
+
+    def test_reference_counts_depth_3(self):
+        self.assert_reference_counts(3)
+
+    def test_start_depth_2(self):
+        game_board = GameBoard(board_string="START", game_type="Original")
+        self.assertEqual(Perft.run_perft(game_board, 2).nodes, 96)
+
+
+class SpiderMoveTests(SimpleTestCase):
+    @staticmethod
+    def get_spider_destinations(board_string):
+        game_board = GameBoard(board_string=board_string, game_type="Original")
+        return sorted(str(move) for move in game_board.get_valid_moves() if move.piece_name == "WhiteSpider1")
+
+    def test_three_step_paths_do_not_backtrack(self):
+        # Around a line of three pieces, only the cells exactly three slides away either side:
+        board_string = "InProgress;White[3];WQ[0,0,0];BQ[0,1,-1];WS1[0,-1,1];BS1[0,2,-2]"
+        self.assertEqual(self.get_spider_destinations(board_string), ["WS1[-1,2,-1]", "WS1[1,1,-2]"])
+
+    def test_destinations_also_reachable_by_shorter_paths(self):
+        # Inside a closed four cell cavity, both cells three slides away are also one slide away:
+        board_string = "InProgress;White[9];WS1[0,0,0];WQ[-1,0,1];WB1[-1,1,0];WB2[0,-1,1];WG1[0,1,-1];" \
+                       "WG2[1,-2,1];WG3[1,1,-2];WA1[2,-2,0];WA2[2,0,-2];WA3[3,-2,-1];WS2[3,-1,-2];BQ[-2,1,1]"
+        self.assertEqual(self.get_spider_destinations(board_string), ["WS1[1,-1,0]", "WS1[1,0,-1]"])
+
+    def test_gated_pocket_is_unreachable(self):
+        # [0,0,0] is three slides away through [0,-1,1], but the last slide squeezes between WQ and WG2:
+        board_string = "InProgress;White[9];WS1[2,-2,0];WQ[1,-1,0];WB1[1,0,-1];WB2[0,1,-1];WG1[-1,1,0];" \
+                       "WG2[-1,0,1];BQ[0,2,-2]"
+        destinations = self.get_spider_destinations(board_string)
+        self.assertNotIn("WS1[0,0,0]", destinations)
+        self.assertEqual(destinations, ["WS1[-1,-1,2]", "WS1[1,1,-2]"])
+
+    def test_gated_pocket_entrance_is_a_dead_end(self):
+        # One slide from the pocket's entrance, the only path through it would have to enter the pocket:
+        board_string = "InProgress;White[9];WS1[1,-2,1];WQ[1,-1,0];WB1[1,0,-1];WB2[0,1,-1];WG1[-1,1,0];" \
+                       "WG2[-1,0,1];BQ[0,2,-2]"
+        self.assertEqual(self.get_spider_destinations(board_string), ["WS1[-2,0,2]", "WS1[2,0,-2]"])
+
+
+class MakeUnmakeMoveTests(SimpleTestCase):
+    board_string = Perft.reference_positions["Original"][1]
+
+    @staticmethod
+    def get_snapshot(game_board):
+        board_metrics = game_board.get_board_metrics()
+        return (game_board.zobrist_key, game_board.board_state, game_board.current_turn,
+                board_metrics.pieces_in_play, board_metrics.pieces_in_hand, list(board_metrics.get_feature_vector()),
+                sorted(str(move) for move in game_board.get_valid_moves()))
+
+    def test_make_unmake_round_trip(self):
+        game_board = GameBoard(board_string=self.board_string, game_type="Original")
+        snapshot = self.get_snapshot(game_board)
+
+        for move in list(game_board.get_valid_moves()):
+            game_board.make_move(move)
+            reply = next(iter(game_board.get_valid_moves()))
+            game_board.make_move(reply)
+            game_board.unmake_move()
+            game_board.unmake_move()
+            self.assertEqual(self.get_snapshot(game_board), snapshot, str(move))
+
+    def test_unmake_without_moves(self):
+        game_board = GameBoard(board_string=self.board_string, game_type="Original")
+        with self.assertRaisesRegex(ValueError, "^You can't unmake any more moves.$"):
+            game_board.unmake_move()
+
+        game_board.make_move(next(iter(game_board.get_valid_moves())))
+        game_board.unmake_move()
+        with self.assertRaises(ValueError):
+            game_board.unmake_move()